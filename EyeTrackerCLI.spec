@@ -2,7 +2,7 @@
 
 
 a = Analysis(
-    ['src\\main.py','src\\config.py','src\\eye_tracker.py','src\\osc_sender.py','src\\fps_timer.py'],
+    ['src\\main.py','src\\config.py','src\\eye_tracker.py','src\\osc_sender.py','src\\fps_timer.py','src\\iris_depth.py','src\\stream_profile.py','src\\calibration.py','src\\deprojection_table.py','src\\face_landmark_backend.py','src\\buffer_pool.py','src\\tracking_state.py','src\\device_lock.py','src\\gaze.py','src\\head_pose.py','src\\simulated_camera.py','src\\adaptive_profile.py','src\\depth_filter.py','src\\tracking.py'],
     pathex=[],
     binaries=[],
     datas=[('env\\Lib\\site-packages\\mediapipe\\modules', 'mediapipe\\modules')],
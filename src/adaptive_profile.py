@@ -0,0 +1,113 @@
+# inference input sizes relative to the color stream
+INPUT_SCALES = (1.0, 0.75, 0.5)
+# frames averaged per decision
+WINDOW = 30
+# mean processing time over the frame budget above which the level steps down
+DOWNGRADE_LOAD = 0.9
+# predicted load on the level above, below which it steps up again
+UPGRADE_LOAD = 0.6
+# consecutive windows with headroom before stepping up, doubled after an upgrade that did not hold
+UPGRADE_WINDOWS = 4
+MAX_UPGRADE_WINDOWS = 64
+
+
+def build_profile_ladder(profiles, width, height, fps, scales=INPUT_SCALES):
+    # (width, height, fps, input_scale) levels from the configured profile down,
+    # the configured fps is kept as long as possible, and within an fps the input scale steps
+    # come before a camera restart, which is only taken when it lowers the inferred pixels further
+    candidates = [p for p in profiles if p[0] <= width and p[1] <= height and p[2] <= fps]
+    if (width, height, fps) not in candidates:
+        candidates.append((width, height, fps))
+    levels = [(w, h, f, s) for w, h, f in candidates for s in scales]
+    levels.sort(key=lambda l: (-l[2], -l[0] * l[1], -l[3]))
+    ladder = []
+    for level in levels:
+        if len(ladder) > 0 and ladder[-1][2] == level[2] and _get_cost(level) >= _get_cost(ladder[-1]):
+            continue
+        ladder.append(level)
+    return ladder
+
+def _get_cost(level):
+    # processing time per second, assumed to scale with the inferred pixels
+    width, height, fps, scale = level
+    return width * height * scale ** 2 * fps
+
+
+class AdaptiveProfileController:
+    def __init__(self, ladder, window=WINDOW):
+        self.ladder = ladder
+        self.window = window
+        self.index = 0
+        self.previous_index = 0
+        self.upgrade_windows = UPGRADE_WINDOWS
+        self.headroom_count = 0
+        self.just_upgraded = False
+        self.skip_count = 0
+        self._reset_window()
+
+    def _reset_window(self):
+        self.total_time = 0.0
+        self.frame_count = 0
+
+    def get_level(self):
+        return self.ladder[self.index]
+
+    def update(self, processing_time):
+        # returns the new level when it changes, otherwise None
+        if self.skip_count > 0:
+            self.skip_count -= 1
+            return None
+        self.total_time += processing_time
+        self.frame_count += 1
+        if self.frame_count < self.window:
+            return None
+        level = self.ladder[self.index]
+        load = self.total_time / self.frame_count * level[2]
+        self._reset_window()
+
+        if load > DOWNGRADE_LOAD:
+            self.headroom_count = 0
+            if self.just_upgraded:
+                # the level above was too much after all, wait longer before trying it again
+                self.upgrade_windows = min(self.upgrade_windows * 2, MAX_UPGRADE_WINDOWS)
+            self.just_upgraded = False
+            if self.index + 1 < len(self.ladder):
+                return self._switch(self.index + 1, load)
+            return None
+        if self.just_upgraded:
+            self.just_upgraded = False
+            self.upgrade_windows = UPGRADE_WINDOWS
+
+        if self.index == 0:
+            return None
+        predicted = load * _get_cost(self.ladder[self.index - 1]) / _get_cost(level)
+        self.headroom_count = self.headroom_count + 1 if predicted < UPGRADE_LOAD else 0
+        if self.headroom_count >= self.upgrade_windows:
+            self.headroom_count = 0
+            self.just_upgraded = True
+            return self._switch(self.index - 1, load)
+        return None
+
+    def _switch(self, index, load):
+        old = self.ladder[self.index]
+        new = self.ladder[index]
+        self.previous_index = self.index
+        self.index = index
+        # the first window after a switch would mix in the restart, so it is skipped
+        self.skip_count = self.window
+        print(
+            f"profile change: {old[0]}x{old[1]}@{old[2]} scale {old[3]} -> {new[0]}x{new[1]}@{new[2]} scale {new[3]}"
+            f" (load {load:.2f})"
+        )
+        return new
+
+    def reject(self):
+        # the level switched to could not be started: it is dropped and the previous level returned
+        failed = self.ladder.pop(self.index)
+        self.index = self.previous_index - 1 if self.previous_index > self.index else self.previous_index
+        self.previous_index = self.index
+        self.just_upgraded = False
+        self.headroom_count = 0
+        level = self.ladder[self.index]
+        print(f"profile {failed[0]}x{failed[1]}@{failed[2]} failed to start, back to {level[0]}x{level[1]}@{level[2]} scale {level[3]}")
+        return level
@@ -0,0 +1,57 @@
+import sys
+import tracemalloc
+import numpy as np
+
+
+class BufferPool:
+    def __init__(self):
+        self.buffers = {}
+        self.allocation_count = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        # reuse the named buffer, reallocate only when the shape or dtype changes
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != np.dtype(dtype):
+            buffer = np.zeros(shape, dtype=dtype)
+            self.buffers[name] = buffer
+            self.allocation_count += 1
+        return buffer
+
+    def get_allocated_bytes(self):
+        return sum(b.nbytes for b in self.buffers.values())
+
+
+class AllocationMonitor:
+    def __init__(self, buffer_pool=None):
+        self.buffer_pool = buffer_pool
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.reset()
+
+    def reset(self):
+        self.frame_count = 0
+        self.total_bytes = 0
+        self.total_blocks = 0
+        self.total_pool_allocations = 0
+
+    def begin_frame(self):
+        tracemalloc.reset_peak()
+        self.start_bytes, _ = tracemalloc.get_traced_memory()
+        self.start_blocks = sys.getallocatedblocks()
+        self.start_pool_allocations = self.buffer_pool.allocation_count if self.buffer_pool is not None else 0
+
+    def end_frame(self):
+        _, peak = tracemalloc.get_traced_memory()
+        # transient bytes allocated during the frame and blocks still alive after it
+        self.total_bytes += peak - self.start_bytes
+        self.total_blocks += sys.getallocatedblocks() - self.start_blocks
+        if self.buffer_pool is not None:
+            self.total_pool_allocations += self.buffer_pool.allocation_count - self.start_pool_allocations
+        self.frame_count += 1
+
+    def get_average(self):
+        count = max(self.frame_count, 1)
+        return self.total_bytes / count, self.total_blocks / count, self.total_pool_allocations / count
+
+    def stop(self):
+        tracemalloc.stop()
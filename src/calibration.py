@@ -0,0 +1,130 @@
+import os
+import json
+import numpy as np
+from iris_depth import IRIS_SIZE, IRIS_SIZE_REL_STD, SENSOR_DEPTH_RANGE
+
+
+CALIBRATION_PATH = os.path.join(os.path.expanduser("~"), ".RealSenseEyeTracker", "calibration.json")
+DEFAULT_USER = "default"
+IRIS_SAMPLE_COUNT = 120
+MAX_IRIS_FIT_ERROR = 0.1 # relative error of the fitted iris diameter
+# the tracker frame (x right, y up, z away from the camera) is left-handed, calibration_points are given
+# in the right-handed frame of /Center, which negates x
+CAMERA_TO_RIGHT_HANDED = np.diag((-1.0, 1.0, 1.0))
+
+
+class Calibration:
+    def __init__(self, iris_size=IRIS_SIZE, iris_size_rel_std=IRIS_SIZE_REL_STD, rotation=None, translation=None):
+        self.iris_size = iris_size
+        self.iris_size_rel_std = iris_size_rel_std
+        # camera-to-world transform, world = rotation @ camera + translation
+        self.rotation = None if rotation is None else np.asarray(rotation, dtype=np.float64)
+        self.translation = None if translation is None else np.asarray(translation, dtype=np.float64)
+
+    def has_transform(self):
+        return self.rotation is not None and self.translation is not None
+
+    def transform_points(self, points):
+        if not self.has_transform():
+            return points
+        return points @ self.rotation.T + self.translation
+
+    def to_dict(self):
+        data = {"iris_size": self.iris_size, "iris_size_rel_std": self.iris_size_rel_std}
+        if self.has_transform():
+            data["rotation"] = self.rotation.tolist()
+            data["translation"] = self.translation.tolist()
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        return Calibration(
+            data.get("iris_size", IRIS_SIZE),
+            data.get("iris_size_rel_std", IRIS_SIZE_REL_STD),
+            data.get("rotation"),
+            data.get("translation")
+        )
+
+
+class CalibrationCache:
+    def __init__(self, path=CALIBRATION_PATH):
+        self.path = path
+
+    @staticmethod
+    def get_key(serial, user):
+        return f"{serial}/{user}"
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def load(self, serial, user=DEFAULT_USER):
+        try:
+            data = self._read()
+        except Exception as e:
+            print(f"Calibration Loading Error: {e}")
+            return None
+        key = self.get_key(serial, user)
+        if key not in data:
+            return None
+        return Calibration.from_dict(data[key])
+
+    def save(self, serial, user, calibration):
+        try:
+            data = self._read()
+            data[self.get_key(serial, user)] = calibration.to_dict()
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # write to a temp file first so a crash never leaves a truncated cache
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=4)
+            os.replace(tmp_path, self.path)
+            return True
+        except Exception as e:
+            print(f"Calibration Saving Error: {e}")
+            return False
+
+
+class IrisSizeCalibrator:
+    def __init__(self, estimator, sample_count=IRIS_SAMPLE_COUNT):
+        self.estimator = estimator
+        self.sample_count = sample_count
+        self.samples = []
+
+    def add(self, iris, sensor_depth):
+        diameter, rel_std = self.estimator.fit_diameter(iris)
+        sensor_depth = np.asarray(sensor_depth, dtype=np.float64)
+        valid = (sensor_depth > SENSOR_DEPTH_RANGE[0]) & (sensor_depth < SENSOR_DEPTH_RANGE[1]) & (rel_std < MAX_IRIS_FIT_ERROR)
+        self.samples.extend((diameter * sensor_depth)[valid].tolist())
+        return self.is_complete()
+
+    def is_complete(self):
+        return len(self.samples) >= self.sample_count
+
+    def get_iris_size(self):
+        samples = np.asarray(self.samples)
+        iris_size = np.median(samples)
+        # robust spread from the median absolute deviation
+        rel_std = 1.4826 * np.median(np.abs(samples - iris_size)) / iris_size
+        return float(iris_size), float(rel_std)
+
+
+def estimate_rigid_transform(camera_points, world_points):
+    # least-squares transform mapping tracker-frame points onto right-handed world points (Kabsch),
+    # the returned matrix includes the handedness change, so its determinant is -1
+    # returns (matrix, translation, rms error in m)
+    camera_points = np.asarray(camera_points, dtype=np.float64) @ CAMERA_TO_RIGHT_HANDED
+    world_points = np.asarray(world_points, dtype=np.float64)
+    camera_centroid = camera_points.mean(axis=0)
+    world_centroid = world_points.mean(axis=0)
+    h = (camera_points - camera_centroid).T @ (world_points - world_centroid)
+    u, _, vt = np.linalg.svd(h)
+    d = np.sign(np.linalg.det(vt.T @ u.T))
+    rotation = vt.T @ np.diag((1.0, 1.0, d)) @ u.T
+    translation = world_centroid - rotation @ camera_centroid
+    residual = camera_points @ rotation.T + translation - world_points
+    rms = float(np.sqrt(np.mean(np.sum(residual ** 2, axis=-1))))
+    return rotation @ CAMERA_TO_RIGHT_HANDED, translation, rms
@@ -2,27 +2,15 @@ import pyrealsense2 as rs
 import ipaddress
 import socket
 import json
+import glob
+import os
+from calibration import DEFAULT_USER
+from face_landmark_backend import BACKENDS, MODEL_NAMES, MODEL_EXTENSIONS
+from tracking_state import DEFAULT_HOLD_TIME
+from simulated_camera import is_simulated_serial
 
-class Config:
-    def __init__(self, serial=None, port=None, is_flip=None):
-        self.serials = self.load_serials_from_connected_devices()
-        self.serial: str = serial
-        if self.serial is None:
-            self.serial: str = self.serials[0] if len(self.serials) > 0 else None
-        self.ip: str = socket.gethostbyname(socket.gethostname())
-        self.port: int = port
-        if self.port is None:
-            self.port: int = 8000
-        self.width: int = 640
-        self.height: int = 480
-        self.fps: int = 60
-        self.is_flip: bool = is_flip
-        if self.is_flip is None:
-            self.is_flip: bool = False
-        self.enable_depth_estimation: bool = False
-        self.show_image: bool = True
-        self.print_fps: bool = False
 
+class Config:
     @staticmethod
     def load_serials_from_connected_devices():
         context = rs.context()
@@ -31,7 +19,7 @@ class Config:
             serial = camera.get_info(rs.camera_info.serial_number)
             serials.append(serial)
         return serials
-    
+
     @staticmethod
     def load_names_from_connected_devices():
         context = rs.context()
@@ -40,168 +28,220 @@ class Config:
             name = camera.get_info(rs.camera_info.name)
             names.append(name)
         return names
-    
-    def get_host_ip(self):
+
+    @staticmethod
+    def get_host_ip():
         return socket.gethostbyname(socket.gethostname())
-    
-    def get_connected_device_count(self):
-        return len(self.serials)
-
-    def load_config(self, path):
-        if path is None:
-            print("set default config")
-            if self.serial is None:
-                print("No camera is found.")
-                return False
-            return True
+
+
+class Field:
+    __slots__ = ("key", "types", "default", "required", "check", "lenient", "aliases")
+
+    def __init__(self, key, types, default, required=True, check=None, lenient=False, aliases=()):
+        self.key = key
+        self.types = types if isinstance(types, tuple) else (types,)
+        self.default = default
+        self.required = required
+        # check(value, context) returns the normalized value or raises ValueError
+        self.check = check
+        # a lenient field falls back to its default on a wrong type instead of failing
+        self.lenient = lenient
+        self.aliases = aliases
+
+
+def _check_serial(value, context):
+    if value == "":
+        if len(context["serials"]) == 0:
+            raise ValueError("No camera is found.")
+        return context["serials"][0]
+    if is_simulated_serial(value):
+        return value
+    if value not in context["serials"]:
+        raise ValueError("serial is not found in the connected devices.")
+    return value
+
+def _check_ip(value, context):
+    if value == "":
+        return context["host_ip"]
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        raise ValueError("ip address is invalid.")
+    return value
+
+def _check_port(value, context):
+    if value == -1:
+        return 8000
+    if 0 <= value <= 1023:
+        raise ValueError("0-1023 are well-known ports. They are reserved for system services.")
+    if not 1023 < value <= 65535:
+        raise ValueError("port number is invalid.")
+    return value
+
+def _default_if_unset(default):
+    return lambda value, context: default if value == -1 else value
+
+def _check_user(value, context):
+    if value == "":
+        raise ValueError("user must be non-empty string.")
+    return value
+
+def _check_points(value, context):
+    if not all(type(p) == list and len(p) == 3 and all(type(c) in (int, float) for c in p) for p in value):
+        raise ValueError("calibration_points must be a list of [x, y, z] in a right-handed frame.")
+    return tuple(tuple(float(c) for c in p) for p in value)
+
+def _check_backend(value, context):
+    if value not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}.")
+    return value
+
+def _check_num_threads(value, context):
+    if value <= 0:
+        raise ValueError("num_threads must be positive integer.")
+    return value
+
+def _check_hold_time(value, context):
+    if value < 0:
+        raise ValueError("hold_time must be non-negative number.")
+    return float(value)
+
+
+TYPE_NAMES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "list"}
+
+SCHEMA = (
+    Field("serial", str, "", check=_check_serial),
+    Field("ip", str, "", check=_check_ip),
+    Field("port", int, 8000, check=_check_port),
+    Field("width", int, 640, check=_default_if_unset(640)),
+    Field("height", int, 480, check=_default_if_unset(480)),
+    Field("fps", int, 60, check=_default_if_unset(30)),
+    Field("is_flip", bool, False, lenient=True),
+    Field("enable_depth_estimation", bool, False, lenient=True, aliases=("enable_estimation_compensation",)),
+    Field("show_image", bool, True, lenient=True),
+    Field("print_fps", bool, False, lenient=True),
+    Field("user", str, DEFAULT_USER, required=False, check=_check_user),
+    Field("calibration_points", list, (), required=False, check=_check_points),
+    Field("backend", str, "mediapipe", required=False, check=_check_backend),
+    Field("model_dir", str, "", required=False),
+    Field("num_threads", int, 1, required=False, check=_check_num_threads),
+    Field("print_allocations", bool, False, required=False, lenient=True),
+    Field("hold_time", (int, float), DEFAULT_HOLD_TIME, required=False, check=_check_hold_time),
+    Field("simulation_clip", str, "", required=False),
+    Field("adaptive_profile", bool, False, required=False, lenient=True),
+    Field("depth_filter", bool, False, required=False, lenient=True),
+    # no depth stream at all, depth comes from the iris size alone
+    Field("color_only", bool, False, required=False, lenient=True),
+)
+
+
+class TrackerConfig:
+    __slots__ = ("path",) + tuple(field.key for field in SCHEMA)
+
+    def __init__(self, path, values):
+        object.__setattr__(self, "path", path)
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TrackerConfig is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("TrackerConfig is immutable.")
+
+    def __reduce__(self):
+        # pickled for worker processes, rebuilt through __init__ as setattr is blocked
+        return (TrackerConfig, (self.path, {field.key: getattr(self, field.key) for field in SCHEMA}))
+
+    def print(self):
+        for field in SCHEMA:
+            print(f"{field.key}: {getattr(self, field.key)}")
+
+
+def compile_config(data, path=None, serials=None, host_ip=None):
+    # validate every field and return (config, errors, warnings), config is None on any error
+    context = {
+        "serials": Config.load_serials_from_connected_devices() if serials is None else serials,
+        "host_ip": Config.get_host_ip() if host_ip is None else host_ip,
+    }
+    values = {}
+    errors = []
+    warnings = []
+    if not isinstance(data, dict):
+        return None, ["config must be a JSON object."], warnings
+    for field in SCHEMA:
+        key = next((k for k in (field.key,) + field.aliases if k in data), None)
+        if key is None:
+            if field.required:
+                errors.append(f"{field.key} is not found in the config file.")
+            values[field.key] = field.default
+            continue
+        if key != field.key:
+            warnings.append(f"{key} is deprecated. use {field.key}.")
+        value = data[key]
+        if type(value) not in field.types:
+            type_name = " or ".join(TYPE_NAMES[t] for t in field.types)
+            if field.lenient:
+                warnings.append(f"{field.key} must be {type_name}. set default {field.key} {field.default}.")
+                values[field.key] = field.default
+            else:
+                errors.append(f"{field.key} must be {type_name}.")
+            continue
         try:
-            print(f"Loading config from {path}")
-            with open(path, "r") as f:
-                data = json.load(f)
-                if "serial" in data:
-                    serial = data["serial"]
-                    print(f"serial: {serial}")
-                    if serial == "":
-                        serial = self.serial
-                        print(f"set default serial {self.serial}")
-                    if serial in self.serials:
-                        self.serial = serial
-                    else:
-                        print("serial is not found in the connected devices.")
-                        return False
-                    self.serial = data["serial"]
-                else:
-                    print("serial is not found in the config file.")
-                    return False
-                
-                if "ip" in data:
-                    ip = data["ip"]
-                    if ip == "":
-                        ip = self.get_host_ip()
-                        print(f"set default ip {self.ip}")
-                    if ipaddress.ip_address(ip):
-                        self.ip = ip
-                    else:
-                        print("ip address is invalid.")
-                        return False
-                else:
-                    print("ip is not found in the config file.")
-                    return False
-                
-                if "port" in data:
-                    if type(data["port"]) == int:
-                        port = int(data["port"])
-                        if 1023 < port <= 65535:
-                            self.port = port
-                        elif port == -1:
-                            self.port = 8000
-                            print(f"set default port {self.port}")
-                        elif 0 <= port <= 1023:
-                            print("0-1023 are well-known ports. They are reserved for system services.")
-                            return False
-                        else:
-                            print("port number is invalid.")
-                            return False
-                    else:
-                        print("port number must be integer.")
-                        return False
-                else:
-                    print("port is not found in the config file.")
-                    return False
-                
-                if "width" in data:
-                    if type(data["width"]) == int:
-                        width = int(data["width"])
-                        if width == -1:
-                            self.width = 640
-                            print(f"set default width {self.width}")
-                        else:
-                            self.width = width
-                    else:
-                        print("width must be integer.")
-                        return False
-                else:
-                    print("width is not found in the config file.")
-                    return False
-                
-                if "height" in data:
-                    if type(data["height"]) == int:
-                        height = int(data["height"])
-                        if height == -1:
-                            self.height = 480
-                            print(f"set default height {self.height}")
-                        else:
-                            self.height = height
-                    else:
-                        print("height must be integer.")
-                        return False
-                else:
-                    print("height is not found in the config file.")
-                    return False
-                
-                if "fps" in data:
-                    if type(data["fps"]) == int:
-                        fps = int(data["fps"])
-                        if fps == -1:
-                            self.fps = 30
-                            print(f"set default fps {self.fps}")
-                        else:
-                            self.fps = fps
-                    else:
-                        print("fps must be integer.")
-                        return False
-                else:
-                    print("fps is not found in the config file.")
-                    return False
-                
-                if "is_flip" in data:
-                    if type(data["is_flip"]) == bool:
-                        self.is_flip = data["is_flip"]
-                    else:
-                        print(f"is_flip must be boolean. set default is_flip {self.is_flip}.")
-                else:
-                    print("is_flip is not found in the config file.")
-                    return False
-                
-                if "enable_depth_estimation" in data:
-                    if type(data["enable_depth_estimation"]) == bool:
-                        self.enable_depth_estimation = data["enable_depth_estimation"]
-                    else:
-                        print(f"enable_depth_estimation must be boolean. set default enable_depth_estimation {self.enable_depth_estimation}.")
-                else:
-                    print("enable_depth_estimation is not found in the config file.")
-                    return False
-                
-                if "show_image" in data:
-                    if type(data["show_image"]) == bool:
-                        self.show_image = data["show_image"]
-                    else:
-                        print(f"show_image must be boolean. set default show_image {self.show_image}.")
-                else:
-                    print("show_image is not found in the config file.")
-                    return False
-                
-                if "print_fps" in data:
-                    if type(data["print_fps"]) == bool:
-                        self.print_fps = data["print_fps"]
-                    else:
-                        print(f"print_fps must be boolean. set default print_fps {self.print_fps}.")
-                else:
-                    print("print_fps is not found in the config file.")
-                    return False
-                
-            print("complete loading config")
-            print(f"serial: {self.serial}")
-            print(f"ip: {self.ip}")
-            print(f"port: {self.port}")
-            print(f"width: {self.width}")
-            print(f"height: {self.height}")
-            print(f"fps: {self.fps}")
-            print(f"is_flip: {self.is_flip}")
-            print(f"enable_depth_estimation: {self.enable_depth_estimation}")
-            print(f"show_image: {self.show_image}")
-            print(f"print_fps: {self.print_fps}")
-            return True
-        except Exception as e:
-            print(f"Loading Error: {e}")
-            return False
\ No newline at end of file
+            values[field.key] = field.check(value, context) if field.check is not None else value
+        except ValueError as e:
+            errors.append(str(e))
+    if values.get("backend", "mediapipe") != "mediapipe" and "model_dir" not in data:
+        files = ", ".join(name + MODEL_EXTENSIONS.get(values["backend"], "") for name in MODEL_NAMES)
+        errors.append(f"model_dir is required for the {values['backend']} backend, with {files}.")
+    if len(errors) > 0:
+        return None, errors, warnings
+    return TrackerConfig(path, values), errors, warnings
+
+def _read_config(path, serials, host_ip, offline=False):
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except Exception as e:
+        return None, [f"Loading Error: {e}"], []
+    if offline and isinstance(data, dict) and isinstance(data.get("serial"), str) and data["serial"] != "":
+        # a recording of the camera stands in for it, so it does not have to be connected
+        serials = [data["serial"]]
+    return compile_config(data, path, serials, host_ip)
+
+def _report(path, errors, warnings):
+    for message in warnings:
+        print(f"{path}: {message}")
+    for message in errors:
+        print(f"{path}: {message}")
+
+def load_config(path, offline=False):
+    print(f"Loading config from {path}")
+    config, errors, warnings = _read_config(path, None, None, offline)
+    _report(path, errors, warnings)
+    if config is None:
+        return None
+    print("complete loading config")
+    config.print()
+    return config
+
+def load_configs(directory="."):
+    # validate every config in the directory, querying the devices and host ip only once
+    serials = Config.load_serials_from_connected_devices()
+    host_ip = Config.get_host_ip()
+    configs = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        config, errors, warnings = _read_config(path, serials, host_ip)
+        _report(path, errors, warnings)
+        configs.append((path, config))
+    return configs
+
+def create_default_config(serial=None, port=None, is_flip=None):
+    data = {field.key: field.default for field in SCHEMA if field.required}
+    data["serial"] = "" if serial is None else serial
+    data["port"] = -1 if port is None else port
+    data["is_flip"] = False if is_flip is None else is_flip
+    print("set default config")
+    config, errors, warnings = compile_config(data)
+    _report("default", errors, warnings)
+    return config
@@ -0,0 +1,84 @@
+import numpy as np
+import pyrealsense2 as rs
+
+
+UNDISTORT_ITERATIONS = 10
+
+
+class DeprojectionTable:
+    def __init__(self, intrinsics, is_flip=False):
+        self.key = self.get_key(intrinsics, is_flip)
+        self.width = intrinsics.width
+        self.height = intrinsics.height
+        # (height, width, 2) normalized image coords of each displayed pixel, y up
+        self.table = self._build(intrinsics, is_flip)
+
+    @staticmethod
+    def get_key(intrinsics, is_flip):
+        return (
+            intrinsics.width, intrinsics.height,
+            intrinsics.fx, intrinsics.fy, intrinsics.ppx, intrinsics.ppy,
+            str(intrinsics.model), tuple(intrinsics.coeffs), is_flip
+        )
+
+    @staticmethod
+    def _build(intrinsics, is_flip):
+        v, u = np.mgrid[0:intrinsics.height, 0:intrinsics.width].astype(np.float64)
+        if is_flip:
+            # displayed pixels come from the sensor image rotated by 180 degrees
+            u = intrinsics.width - u - 1
+            v = intrinsics.height - v - 1
+        x = (u - intrinsics.ppx) / intrinsics.fx
+        y = (v - intrinsics.ppy) / intrinsics.fy
+        x, y = DeprojectionTable._undistort(x, y, intrinsics.model, intrinsics.coeffs)
+        if is_flip:
+            x = -x
+            y = -y
+        return np.stack((x, -y), axis=-1).astype(np.float32)
+
+    @staticmethod
+    def _undistort(x, y, model, k):
+        # vectorized counterpart of rs2_deproject_pixel_to_point
+        if model in (rs.distortion.inverse_brown_conrady, rs.distortion.brown_conrady):
+            xo = x.copy()
+            yo = y.copy()
+            for _ in range(UNDISTORT_ITERATIONS):
+                r2 = x * x + y * y
+                icdist = 1.0 / (1.0 + ((k[4] * r2 + k[1]) * r2 + k[0]) * r2)
+                if model == rs.distortion.inverse_brown_conrady:
+                    xq = x / icdist
+                    yq = y / icdist
+                else:
+                    xq = x
+                    yq = y
+                delta_x = 2 * k[2] * xq * yq + k[3] * (r2 + 2 * xq * xq)
+                delta_y = 2 * k[3] * xq * yq + k[2] * (r2 + 2 * yq * yq)
+                x = (xo - delta_x) * icdist
+                y = (yo - delta_y) * icdist
+        elif model == rs.distortion.kannala_brandt4:
+            rd = np.sqrt(x * x + y * y)
+            theta = rd.copy()
+            for _ in range(UNDISTORT_ITERATIONS):
+                theta2 = theta * theta
+                f = theta * (1 + theta2 * (k[0] + theta2 * (k[1] + theta2 * (k[2] + theta2 * k[3])))) - rd
+                df = 1 + theta2 * (3 * k[0] + theta2 * (5 * k[1] + theta2 * (7 * k[2] + 9 * theta2 * k[3])))
+                theta = theta - f / df
+            with np.errstate(all="ignore"):
+                scale = np.where(rd > 0, np.tan(theta) / rd, 1.0)
+            x = x * scale
+            y = y * scale
+        return x, y
+
+    def lookup(self, u, v):
+        # bilinear interpolation for subpixel coords, clamped to the image
+        u = np.clip(np.asarray(u, dtype=np.float64), 0, self.width - 1)
+        v = np.clip(np.asarray(v, dtype=np.float64), 0, self.height - 1)
+        u0 = np.minimum(u.astype(np.intp), self.width - 2)
+        v0 = np.minimum(v.astype(np.intp), self.height - 2)
+        fu = (u - u0)[..., None]
+        fv = (v - v0)[..., None]
+        t = self.table
+        top = t[v0, u0] * (1 - fu) + t[v0, u0 + 1] * fu
+        bottom = t[v0 + 1, u0] * (1 - fu) + t[v0 + 1, u0 + 1] * fu
+        coords = top * (1 - fv) + bottom * fv
+        return coords[..., 0], coords[..., 1]
@@ -0,0 +1,70 @@
+import numpy as np
+
+
+# half size of the depth window around each eye in depth pixels
+ROI_RADIUS = 6
+# spatial filter: gaussian over the pixel distance and over the depth difference to the window median
+SPATIAL_SIGMA = 3.0 # px
+SPATIAL_DEPTH_SIGMA = 0.01 # m
+# temporal filter: smoothing factor, and the jump above which it restarts from the new depth
+TEMPORAL_ALPHA = 0.4
+TEMPORAL_DELTA = 0.02 # m
+# frames the last depth is held while the window has no valid pixel
+PERSISTENCE_FRAMES = 3
+
+
+class DepthRoiFilter:
+    # NumPy counterpart of the librealsense spatial, temporal and hole-filling filters,
+    # run on a small window per eye instead of the whole frame
+    def __init__(self, count=2, radius=ROI_RADIUS):
+        self.radius = radius
+        size = 2 * radius + 1
+        v, u = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+        self.spatial_weights = np.exp(-(u * u + v * v) / (2 * SPATIAL_SIGMA ** 2)).astype(np.float32)
+        # window buffers, reused every call
+        self.roi = np.zeros((size, size), dtype=np.float32)
+        self.valid = np.zeros((size, size), dtype=bool)
+        self.weights = np.zeros((size, size), dtype=np.float32)
+        self.last_depth = np.zeros(count, dtype=np.float64)
+        self.missing_count = np.zeros(count, dtype=np.int64)
+
+    def reset(self):
+        self.last_depth[:] = 0.0
+        self.missing_count[:] = 0
+
+    def sample(self, depth_data, u, v, units):
+        # edge-preserving mean depth in m around (u, v), 0 when the window has no valid pixel
+        height, width = depth_data.shape
+        u0, u1 = max(u - self.radius, 0), min(u + self.radius + 1, width)
+        v0, v1 = max(v - self.radius, 0), min(v + self.radius + 1, height)
+        # pixels outside the frame stay 0 and count as holes
+        self.roi.fill(0.0)
+        roi = self.roi[v0 - v + self.radius:v1 - v + self.radius, u0 - u + self.radius:u1 - u + self.radius]
+        np.multiply(depth_data[v0:v1, u0:u1], units, out=roi)
+        np.greater(self.roi, 0.0, out=self.valid)
+        if not self.valid.any():
+            return 0.0
+        # holes get no weight, so the centre is filled from its valid neighbours
+        reference = np.median(self.roi[self.valid])
+        np.subtract(self.roi, reference, out=self.weights)
+        np.square(self.weights, out=self.weights)
+        np.multiply(self.weights, -0.5 / SPATIAL_DEPTH_SIGMA ** 2, out=self.weights)
+        np.exp(self.weights, out=self.weights)
+        np.multiply(self.weights, self.spatial_weights, out=self.weights)
+        np.multiply(self.weights, self.valid, out=self.weights)
+        return float(np.dot(self.weights.ravel(), self.roi.ravel()) / self.weights.sum())
+
+    def update(self, index, depth):
+        # temporal smoothing per eye, holding the last depth over short dropouts
+        last = self.last_depth[index]
+        if depth <= 0:
+            self.missing_count[index] += 1
+            if last > 0 and self.missing_count[index] <= PERSISTENCE_FRAMES:
+                return last
+            self.last_depth[index] = 0.0
+            return 0.0
+        self.missing_count[index] = 0
+        if last > 0 and abs(depth - last) < TEMPORAL_DELTA:
+            depth = TEMPORAL_ALPHA * depth + (1 - TEMPORAL_ALPHA) * last
+        self.last_depth[index] = depth
+        return depth
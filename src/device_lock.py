@@ -0,0 +1,99 @@
+import os
+import glob
+import tempfile
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+LOCK_DIR = os.path.join(tempfile.gettempdir(), "RealSenseEyeTracker_locks")
+LOCK_EXTENSION = ".lock"
+# the lock covers one byte past the pid so other processes can still read the pid
+LOCK_OFFSET = 64
+
+# locks held by this process, query must not touch them (closing a file drops POSIX locks)
+_held_locks = {}
+
+
+def _try_lock(fd):
+    try:
+        if os.name == "nt":
+            os.lseek(fd, LOCK_OFFSET, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, LOCK_OFFSET)
+        return True
+    except OSError:
+        return False
+
+def _unlock(fd):
+    if os.name == "nt":
+        os.lseek(fd, LOCK_OFFSET, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.lockf(fd, fcntl.LOCK_UN, 1, LOCK_OFFSET)
+
+def _read_pid(fd):
+    os.lseek(fd, 0, os.SEEK_SET)
+    data = os.read(fd, LOCK_OFFSET).split(b"\n")[0].strip()
+    return int(data) if data.isdigit() else None
+
+
+class DeviceLock:
+    # advisory lock per camera serial, the OS releases it when the process dies
+    def __init__(self, serial, lock_dir=LOCK_DIR):
+        self.serial = serial
+        self.path = os.path.join(lock_dir, serial + LOCK_EXTENSION)
+        self.fd = None
+
+    def acquire(self):
+        if self.serial in _held_locks:
+            return False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        if not _try_lock(fd):
+            os.close(fd)
+            return False
+        pid = f"{os.getpid()}\n".encode()
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, pid.ljust(LOCK_OFFSET - 1, b" "))
+        self.fd = fd
+        _held_locks[self.serial] = self
+        return True
+
+    def get_owner(self):
+        # pid of the process holding the lock, None when the camera is free
+        if self.serial in _held_locks:
+            return os.getpid()
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        try:
+            if _try_lock(fd):
+                _unlock(fd)
+                return None
+            return _read_pid(fd)
+        finally:
+            os.close(fd)
+
+    def release(self):
+        if self.fd is None:
+            return
+        try:
+            _unlock(self.fd)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+            _held_locks.pop(self.serial, None)
+            # the file itself stays, removing it would race with a process opening it
+
+
+def query_device_locks(serials=(), lock_dir=LOCK_DIR):
+    # {serial: pid or None} for the given serials and every existing lock file
+    serials = set(serials)
+    for path in glob.glob(os.path.join(lock_dir, "*" + LOCK_EXTENSION)):
+        serials.add(os.path.basename(path)[:-len(LOCK_EXTENSION)])
+    return {serial: DeviceLock(serial, lock_dir).get_owner() for serial in sorted(serials)}
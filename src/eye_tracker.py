@@ -1,188 +1,459 @@
+import time
+import datetime
 import numpy as np
 import pyrealsense2 as rs
 import cv2
-import mediapipe
+from face_landmark_backend import create_backend
+from iris_depth import IrisDepthEstimator, IRIS_SIZE
+from calibration import CAMERA_TO_RIGHT_HANDED
+from stream_profile import query_video_profiles, select_profile, select_depth_profile
+from deprojection_table import DeprojectionTable
+from buffer_pool import BufferPool
+from tracking_state import TrackingState, DEFAULT_HOLD_TIME
+from gaze import GazeEstimator
+from simulated_camera import is_simulated_serial, SimulatedPipeline, SimulatedConfig
+from head_pose import HeadPoseEstimator, HEAD_LANDMARKS, rotation_to_quaternion
+from depth_filter import DepthRoiFilter
+from adaptive_profile import AdaptiveProfileController, build_profile_ladder
 
 
 EYE_LANDMARKS = [468, 473]
-IRIS_LANDMARKS = [[471,469],[476,474]]
-IRIS_SIZE = 0.0117 # m
+# iris centre followed by the four contour points
+IRIS_LANDMARKS = [[468,469,470,471,472],[473,474,475,476,477]]
+NOMINAL_DEPTH = 0.6 # m, first guess when mapping color pixels to depth pixels
+# a recording without a new frame for this long has reached its end
+PLAYBACK_TIMEOUT = 2000 # ms
 
 
 class EyeTracker:
-    def __init__(self, serial, width=640, height=480, fps=30, is_flip=False, enable_depth_estimation=False):
+    def __init__(self, serial, width=640, height=480, fps=30, is_flip=False, enable_depth_estimation=False, calibration=None, backend="mediapipe", model_dir="", num_threads=1, enable_display=True, hold_time=DEFAULT_HOLD_TIME, simulation_clip="", adaptive_profile=False, depth_filter=False, recording="", color_only=False):
         self.serial = serial
+        # a .bag recording replaces the camera, its streams decide the profile
+        self.recording = recording
+        self.playback = None
+        self.finished = False
         self.width = width
         self.height = height
         self.fps = fps
         self.is_flip = is_flip
-        self.enable_depth_estimation = enable_depth_estimation
+        # sensor depth alone, sensor depth fused with the iris estimate (the iris takes over on dropouts),
+        # or with color_only the iris estimate without a depth stream
+        self.enable_depth_estimation = enable_depth_estimation or color_only
+        self.enable_sensor_depth = not color_only
+        # filtering runs on small windows around the eyes, never on the whole depth frame
+        self.depth_filter = DepthRoiFilter(len(EYE_LANDMARKS)) if depth_filter and self.enable_sensor_depth else None
+        self.calibration = calibration
+        self.backend_name = backend
+        self.model_dir = model_dir
+        self.num_threads = num_threads
+        self.enable_display = enable_display
+        self.tracking_state = TrackingState(hold_time)
+        self.adaptive_profile = adaptive_profile
+        self.profile_controller = None
+        # inference runs on the color image resized by this factor
+        self.input_scale = 1.0
+        self.color_format = rs.format.bgr8
+        self.color_profiles = []
+        self.backend = None
+        self.depth_frame = None
+        self.deprojection_table = None
         self.pipeline_started = False
-        self.pipeline = rs.pipeline()
-        self.config = rs.config()
+        self.frame_timestamp = None
+        self.frame_number = -1
+        self.frame_start = time.perf_counter()
+        if is_simulated_serial(serial):
+            # synthetic frames, or a replayed clip, for running without a camera
+            self.pipeline = SimulatedPipeline(simulation_clip)
+            self.config = SimulatedConfig()
+        else:
+            self.pipeline = rs.pipeline()
+            self.config = rs.config()
         
-        self.color_image = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self.buffer_pool = BufferPool()
+        self._allocate_buffers()
+
+    def _allocate_buffers(self):
+        # per-frame image and result buffers, reused across frames
+        # RGB image for inference and BGR image for the preview, never shared
+        self.input_image = self.buffer_pool.get("input_image", (self.height, self.width, 3))
+        self.display_image = self.buffer_pool.get("display_image", (self.height, self.width, 3))
+        self.inference_size = (max(round(self.width * self.input_scale), 1), max(round(self.height * self.input_scale), 1))
+        if self.inference_size == (self.width, self.height):
+            self.inference_image = self.input_image
+        else:
+            self.inference_image = self.buffer_pool.get("inference_image", self.inference_size[::-1] + (3,))
+        self.image_scale = self.buffer_pool.get("image_scale", (2,), np.float64)
+        self.image_scale[:] = (self.width, self.height)
+        self.eyes = self.buffer_pool.get("eyes", (2, 3), np.float64)
+        self.iris = self.buffer_pool.get("iris", (2, 5, 2), np.float64)
+        self.iris_norm_coords = self.buffer_pool.get("iris_norm_coords", (2, 5, 2), np.float64)
+        self.sensor_depth = self.buffer_pool.get("sensor_depth", (2,), np.float64)
+        self.positions = self.buffer_pool.get("positions", (2, 3), np.float64)
+        self.gaze = self.buffer_pool.get("gaze", (2, 3), np.float64)
+        self.gaze_valid = self.buffer_pool.get("gaze_valid", (2,), bool)
+        self.gaze_estimator = GazeEstimator(self.width, self.height)
+        self.head_points = self.buffer_pool.get("head_points", (len(HEAD_LANDMARKS), 2), np.float64)
+        self.head_norm_coords = self.buffer_pool.get("head_norm_coords", (len(HEAD_LANDMARKS), 2), np.float64)
+        self.head_position = self.buffer_pool.get("head_position", (3,), np.float64)
+        self.head_rotation = self.buffer_pool.get("head_rotation", (4,), np.float64)
+        self.head_pose_valid = False
+        self.head_pose_estimator = HeadPoseEstimator()
     
     def _configure_pipeline(self):
+        if self.recording != "":
+            return self._configure_playback()
         try:
             self.config.enable_device(self.serial)
-            self.config.enable_stream(rs.stream.depth, self.width, self.height, rs.format.z16, self.fps)
-            self.config.enable_stream(rs.stream.color, self.width, self.height, rs.format.bgr8, self.fps)
-
-            self.mp_face_mesh = mediapipe.solutions.face_mesh
-            self.mp_drawing = mediapipe.solutions.drawing_utils
-            self.mp_drawing_styles = mediapipe.solutions.drawing_styles
-            self.face_mesh = self.mp_face_mesh.FaceMesh(
-                max_num_faces=1,
-                refine_landmarks=True,
-                min_detection_confidence=0.3,
-                min_tracking_confidence=0.5
-            )
+            # the landmark models take RGB, so ask the camera for it when it can deliver
+            color_profiles = query_video_profiles(self.serial, rs.stream.color, rs.format.rgb8)
+            self.color_format = rs.format.rgb8
+            if (self.width, self.height, self.fps) not in color_profiles:
+                bgr_profiles = query_video_profiles(self.serial, rs.stream.color, rs.format.bgr8)
+                if (self.width, self.height, self.fps) in bgr_profiles or len(color_profiles) == 0:
+                    color_profiles = bgr_profiles
+                    self.color_format = rs.format.bgr8
+            self.color_profiles = color_profiles
+            color_profile = select_profile(color_profiles, self.width, self.height, self.fps)
+            if color_profile is not None and color_profile != (self.width, self.height, self.fps):
+                print(f"color profile {self.width}x{self.height}@{self.fps} is not supported. use {color_profile[0]}x{color_profile[1]}@{color_profile[2]}")
+                self.width, self.height, self.fps = color_profile
+                self._allocate_buffers()
+            print(f"color format: {self.color_format}")
+            self._enable_streams()
+            self._create_backend()
+            if self.adaptive_profile:
+                # the configured profile is the top of the ladder and the fps to hold
+                ladder = build_profile_ladder(self.color_profiles, self.width, self.height, self.fps)
+                self.profile_controller = AdaptiveProfileController(ladder)
+                print(f"adaptive profile: {len(ladder)} levels")
+            return True
+        except Exception as e:
+            print(f"Configuration Error: {e}")
+            return False
+
+    def _configure_playback(self):
+        try:
+            # every recorded stream is enabled, profiles come from the file
+            self.config.enable_device_from_file(self.recording, repeat_playback=False)
+            self._create_backend()
             return True
         except Exception as e:
             print(f"Configuration Error: {e}")
             return False
 
+    def _create_backend(self):
+        self.backend = create_backend(
+            self.backend_name,
+            self.model_dir,
+            self.num_threads,
+            min_detection_confidence=0.3,
+            min_tracking_confidence=0.5
+        )
+        print(f"face landmark backend: {self.backend_name}")
+        if self.backend_name == "mediapipe":
+            print("mediapipe reports a fixed confidence and redetects lost faces on the full frame")
+
+    def _enable_streams(self):
+        self.config.enable_stream(rs.stream.color, self.width, self.height, self.color_format, self.fps)
+        if self.enable_sensor_depth:
+            depth_profile = select_depth_profile(query_video_profiles(self.serial, rs.stream.depth, rs.format.z16), self.width, self.height, self.fps)
+            if depth_profile is None:
+                depth_profile = (self.width, self.height, self.fps)
+            print(f"depth profile: {depth_profile[0]}x{depth_profile[1]}@{depth_profile[2]}")
+            self.config.enable_stream(rs.stream.depth, depth_profile[0], depth_profile[1], rs.format.z16, depth_profile[2])
+            if self.enable_depth_estimation:
+                print("sensor depth is fused with iris-based depth.")
+        else:
+            print("depth stream is disabled. use iris-based depth.")
+
     def start(self):
         result = self._configure_pipeline()
         if not result:
             return False
+        return self._start_pipeline()
+
+    def _start_pipeline(self):
         try:
             self.pipeline.start(self.config)
             print("pipeline started.")
             self.pipeline_started = True
-            self.intrinsics = self.pipeline.get_active_profile().get_stream(rs.stream.color).as_video_stream_profile().get_intrinsics()
-            align_to = rs.stream.color
-            self.align = rs.align(align_to)
+            profile = self.pipeline.get_active_profile()
+            color_stream = profile.get_stream(rs.stream.color).as_video_stream_profile()
+            if self.recording != "":
+                self._start_playback(profile, color_stream)
+            self.intrinsics = color_stream.get_intrinsics()
+            self.update_deprojection_table()
+            if self.enable_sensor_depth:
+                depth_stream = profile.get_stream(rs.stream.depth).as_video_stream_profile()
+                self.depth_intrinsics = depth_stream.get_intrinsics()
+                self.color_to_depth_extrinsics = color_stream.get_extrinsics_to(depth_stream)
+            if self.calibration is not None:
+                self.iris_depth_estimator = IrisDepthEstimator(self.calibration.iris_size, self.intrinsics.fx, self.calibration.iris_size_rel_std)
+            else:
+                self.iris_depth_estimator = IrisDepthEstimator(IRIS_SIZE, self.intrinsics.fx)
             return True
         except Exception as e:
             print(f"Pipeline Error: {e}")
             return False
 
+    def _start_playback(self, profile, color_stream):
+        if color_stream.format() not in (rs.format.rgb8, rs.format.bgr8):
+            raise RuntimeError(f"color format {color_stream.format()} of the recording is not supported.")
+        self.color_format = color_stream.format()
+        self.width, self.height, self.fps = color_stream.width(), color_stream.height(), color_stream.fps()
+        self._allocate_buffers()
+        print(f"recording: {self.recording} {self.width}x{self.height}@{self.fps}")
+        if self.enable_sensor_depth and not any(s.stream_type() == rs.stream.depth for s in profile.get_streams()):
+            print("the recording has no depth stream. use iris-based depth.")
+            self.enable_sensor_depth = False
+            self.enable_depth_estimation = True
+        self.playback = profile.get_device().as_playback()
+        # offline processing takes every frame, however long it takes
+        self.playback.set_real_time(False)
+
+    def seek(self, seconds):
+        self.playback.seek(datetime.timedelta(seconds=seconds))
+
+    def set_profile(self, width, height, fps):
+        # restart the streams with another profile, everything derived from it follows
+        # when the start fails the previous profile is kept and the pipeline stays stopped
+        if self.pipeline_started:
+            self.pipeline.stop()
+            self.pipeline_started = False
+        previous = (self.width, self.height, self.fps)
+        self.width, self.height, self.fps = width, height, fps
+        self._allocate_buffers()
+        self.config.disable_all_streams()
+        self._enable_streams()
+        if self._start_pipeline():
+            return True
+        self.width, self.height, self.fps = previous
+        self._allocate_buffers()
+        return False
+
+    def apply_profile_level(self, level):
+        # returns False when the streams could not be restarted with the level's profile
+        width, height, fps, input_scale = level
+        self.input_scale = input_scale
+        if (width, height, fps) != (self.width, self.height, self.fps) or not self.pipeline_started:
+            if not self.set_profile(width, height, fps):
+                return False
+        else:
+            self._allocate_buffers()
+        # the backend's face roi is in pixels of the previous inference image
+        self.backend.reset()
+        return True
+
     def update_image(self):
-        frames = self.pipeline.wait_for_frames()
-        aligned_frames = self.align.process(frames)
-        color_frame = aligned_frames.get_color_frame()
-        self.depth_frame = aligned_frames.get_depth_frame()
-        if not color_frame or not self.depth_frame:
+        if self.playback is not None:
+            ok, frames = self.pipeline.try_wait_for_frames(PLAYBACK_TIMEOUT)
+            if not ok:
+                self.finished = True
+                return None
+        else:
+            frames = self.pipeline.wait_for_frames()
+        color_frame = frames.get_color_frame()
+        if not color_frame:
             return None
+        self.frame_timestamp = color_frame.get_timestamp()
+        self.frame_number = color_frame.get_frame_number()
+        # processing time counts from here, waiting for the frame is not part of it
+        self.frame_start = time.perf_counter()
+        if self.enable_sensor_depth:
+            self.depth_frame = frames.get_depth_frame()
+            if not self.depth_frame:
+                return None
         
+        # copy out of the librealsense frame so it goes back to the frame queue right away,
+        # with at most one color conversion per frame
         color_data = np.asanyarray(color_frame.get_data())
+        if self.color_format == rs.format.rgb8:
+            self.copy_image(color_data, self.input_image)
+            if self.enable_display:
+                cv2.cvtColor(self.input_image, cv2.COLOR_RGB2BGR, dst=self.display_image)
+        else:
+            self.copy_image(color_data, self.display_image)
+            cv2.cvtColor(self.display_image, cv2.COLOR_BGR2RGB, dst=self.input_image)
+
+    def copy_image(self, src, dst):
         if self.is_flip:
-            self.color_image = cv2.flip(color_data, -1)
+            cv2.flip(src, -1, dst=dst)
         else:
-            self.color_image = color_data
+            np.copyto(dst, src)
     
     def track_eyes(self):
-        results = self.face_mesh.process(self.color_image)
-        if results.multi_face_landmarks:
-            for face_landmarks in results.multi_face_landmarks:
-                self.mp_drawing.draw_landmarks(
-                    image=self.color_image,
-                    landmark_list=face_landmarks,
-                    connections=self.mp_face_mesh.FACEMESH_TESSELATION,
-                    landmark_drawing_spec=None,
-                    connection_drawing_spec=self.mp_drawing_styles.get_default_face_mesh_tesselation_style()
-                )
-                self.mp_drawing.draw_landmarks(
-                    image=self.color_image,
-                    landmark_list=face_landmarks,
-                    connections=self.mp_face_mesh.FACEMESH_CONTOURS,
-                    landmark_drawing_spec=None,
-                    connection_drawing_spec=self.mp_drawing_styles.get_default_face_mesh_contours_style()
-                )
-                self.mp_drawing.draw_landmarks(
-                    image=self.color_image,
-                    landmark_list=face_landmarks,
-                    connections=self.mp_face_mesh.FACEMESH_IRISES,
-                    landmark_drawing_spec=None,
-                    connection_drawing_spec=self.mp_drawing_styles.get_default_face_mesh_iris_connections_style()
-                )
-
-                point = face_landmarks.landmark[EYE_LANDMARKS[0]]
-                u, v = self.transform_point_to_uv(point)
-                depth = self.get_depth(u, v)
-                left_eye = (u, v, depth)
-
-                point = face_landmarks.landmark[EYE_LANDMARKS[1]]
-                u, v = self.transform_point_to_uv(point)
-                depth = self.get_depth(u, v)
-                right_eye = (u, v, depth)
-
-                point = face_landmarks.landmark[IRIS_LANDMARKS[0][0]]
-                u1, v1 = self.transform_point_to_uv(point)
-                point = face_landmarks.landmark[IRIS_LANDMARKS[0][1]]
-                u2, v2 = self.transform_point_to_uv(point)
-                left_iris = ((u1,v1), (u2,v2))
-
-                point = face_landmarks.landmark[IRIS_LANDMARKS[1][0]]
-                u1, v1 = self.transform_point_to_uv(point)
-                point = face_landmarks.landmark[IRIS_LANDMARKS[1][1]]
-                u2, v2 = self.transform_point_to_uv(point)
-                right_iris = ((u1,v1), (u2,v2))
-
-                return left_eye, right_eye, left_iris, right_iris
-        return None, None, None, None
+        if self.inference_image is not self.input_image:
+            cv2.resize(self.input_image, self.inference_size, dst=self.inference_image, interpolation=cv2.INTER_AREA)
+        # landmarks are normalized, so they do not depend on the inference size
+        landmarks = self.backend.process(self.inference_image)
+        if landmarks is None:
+            return None, None, None, None
+        if self.enable_display:
+            self.backend.draw(self.display_image)
+
+        # results are written into the preallocated buffers and stay valid until the next frame
+        self.landmarks = landmarks
+        self.transform_landmarks_to_uv(landmarks, IRIS_LANDMARKS, out=self.iris)
+        for i in range(2):
+            self.eyes[i, :2] = self.iris[i, 0]
+            self.eyes[i, 2] = self.get_depth(*self.transform_point_to_uv(landmarks[EYE_LANDMARKS[i]]), index=i)
+        return self.eyes[0], self.eyes[1], self.iris[0], self.iris[1]
     
     def transform_point_to_uv(self, point):
-        u = np.clip(int(point.x * self.width), 0, self.width - 1)
-        v = np.clip(int(point.y * self.height), 0, self.height - 1)
+        u = np.clip(int(point[0] * self.width), 0, self.width - 1)
+        v = np.clip(int(point[1] * self.height), 0, self.height - 1)
         return u, v
+
+    def transform_landmarks_to_uv(self, landmarks, indices, out=None):
+        # subpixel uv of the given landmark indices, keeps the shape of indices
+        return np.multiply(landmarks[indices, :2], self.image_scale, out=out)
     
-    def get_depth(self, u, v):
+    def get_depth(self, u, v, index=None):
+        # index selects the temporal filter state of an eye, when the depth filter is enabled
+        if self.depth_frame is None:
+            return 0.0
         if self.is_flip:
             u = self.width - u - 1
             v = self.height - v - 1
-        return self.depth_frame.get_distance(u, v)
+        # look up once at a nominal depth, then again with the measured depth to correct the parallax
+        depth = self.sample_depth(*self.transform_color_uv_to_depth_uv(u, v, NOMINAL_DEPTH))
+        if depth > 0:
+            depth = self.sample_depth(*self.transform_color_uv_to_depth_uv(u, v, depth))
+        if self.depth_filter is not None and index is not None:
+            depth = self.depth_filter.update(index, depth)
+        return depth
+
+    def sample_depth(self, du, dv):
+        if self.depth_filter is None:
+            return self.depth_frame.get_distance(du, dv)
+        # the frame data is a view, nothing outside the window is touched
+        depth_data = np.asanyarray(self.depth_frame.get_data())
+        return self.depth_filter.sample(depth_data, du, dv, self.depth_frame.get_units())
+
+    def transform_color_uv_to_depth_uv(self, u, v, depth):
+        point = rs.rs2_deproject_pixel_to_point(self.intrinsics, [float(u), float(v)], depth)
+        point = rs.rs2_transform_point_to_point(self.color_to_depth_extrinsics, point)
+        du, dv = rs.rs2_project_point_to_pixel(self.depth_intrinsics, point)
+        du = int(np.clip(round(du), 0, self.depth_intrinsics.width - 1))
+        dv = int(np.clip(round(dv), 0, self.depth_intrinsics.height - 1))
+        return du, dv
 
     def estimate_eye_position(self, left_eye, right_eye, left_iris, right_iris):
+        # no copies when the inputs are already the tracker's own buffers
+        self.eyes[0] = left_eye
+        self.eyes[1] = right_eye
+        self.iris[0] = left_iris
+        self.iris[1] = right_iris
+        self.iris_norm_coords[..., 0], self.iris_norm_coords[..., 1] = self.transform_uv_to_norm_image_coords(self.iris[..., 0], self.iris[..., 1])
+        self.sensor_depth[:] = self.eyes[:, 2]
         if self.enable_depth_estimation:
-            left_eye_estimated_depth = self.depth_estimation(left_iris)
-            right_eye_estimated_depth = self.depth_estimation(right_iris)
-            #print(f"left eye depth error: {np.abs(left_eye[2] - left_eye_estimated_depth)}, right eye depth error: {np.abs(right_eye[2] - right_eye_estimated_depth)}") 
-            left_eye = (left_eye[0], left_eye[1], left_eye_estimated_depth)
-            right_eye = (right_eye[0], right_eye[1], right_eye_estimated_depth)
-            left_eye_position = self.deprojection(left_eye)
-            right_eye_position = self.deprojection(right_eye)
-        else:
-            left_eye_position = self.deprojection(left_eye)
-            right_eye_position = self.deprojection(right_eye)
-        return left_eye_position, right_eye_position
+            self.eyes[:, 2], _ = self.iris_depth_estimator.fuse(self.iris_norm_coords, self.sensor_depth)
+        self.deprojection(self.eyes, out=self.positions)
+        self.estimate_gaze()
+        self.estimate_head_pose()
+        return self.positions[0], self.positions[1]
+
+    def update_deprojection_table(self):
+        # rebuild only when the stream profile or flip setting has changed
+        key = DeprojectionTable.get_key(self.intrinsics, self.is_flip)
+        if self.deprojection_table is None or self.deprojection_table.key != key:
+            self.deprojection_table = DeprojectionTable(self.intrinsics, self.is_flip)
 
     def transform_uv_to_norm_image_coords(self, u, v):
-        x = (u - self.intrinsics.ppx) / self.intrinsics.fx
-        y = -(v - self.intrinsics.ppy) / self.intrinsics.fy
-        return x, y
+        return self.deprojection_table.lookup(u, v)
     
-    def deprojection(self, eye):
-        u = eye[0]
-        v = eye[1]
-        depth = eye[2]
-        x, y = self.transform_uv_to_norm_image_coords(u, v)
-        x *= depth
-        y *= depth
-        return x, y, depth
+    def deprojection(self, eyes, out=None):
+        # eyes: (..., 3) rows of u, v, depth
+        eyes = np.asarray(eyes, dtype=np.float64)
+        if out is None:
+            out = np.empty(eyes.shape, dtype=np.float64)
+        depth = eyes[..., 2]
+        x, y = self.transform_uv_to_norm_image_coords(eyes[..., 0], eyes[..., 1])
+        np.multiply(x, depth, out=out[..., 0])
+        np.multiply(y, depth, out=out[..., 1])
+        out[..., 2] = depth
+        if self.calibration is not None and self.calibration.has_transform():
+            out[:] = self.calibration.transform_points(out)
+        return out
     
-    def depth_estimation(self, iris):
-        iris1_norm_coords = self.transform_uv_to_norm_image_coords(iris[0][0], iris[0][1])
-        iris2_norm_coords = self.transform_uv_to_norm_image_coords(iris[1][0], iris[1][1])
-        iris_size_norm_coords = np.linalg.norm(np.array(iris1_norm_coords) - np.array(iris2_norm_coords))
-        return IRIS_SIZE / iris_size_norm_coords
-
     def get_eye_position(self):
+        left_eye, right_eye = self._get_eye_position()
+        if self.profile_controller is not None:
+            level = self.profile_controller.update(time.perf_counter() - self.frame_start)
+            # positions keep their buffers, the returned views stay valid
+            if level is not None and not self.apply_profile_level(level):
+                if not self.apply_profile_level(self.profile_controller.reject()):
+                    print("failed to restart the pipeline. stop tracking.")
+                    self.finished = True
+        return left_eye, right_eye
+
+    def _get_eye_position(self):
         self.update_image()
+        # frame_timestamp is still None when no color frame has arrived yet
+        if self.finished or self.frame_timestamp is None:
+            return None, None
         left_eye, right_eye, left_iris, right_iris = self.track_eyes()
         if left_eye is not None and right_eye is not None and left_iris is not None and right_iris is not None:
+            # the frame clock, so a recording played faster than real time keeps its hold time
+            self.tracking_state.update(True, self.backend.confidence, self.frame_timestamp / 1000)
             return self.estimate_eye_position(left_eye, right_eye, left_iris, right_iris)
+        self.tracking_state.update(False, 0.0, self.frame_timestamp / 1000)
+        if self.tracking_state.is_holding():
+            # positions still hold the last estimate
+            return self.positions[0], self.positions[1]
+        # the last head pose is too old to warm-start from
+        self.head_pose_estimator.reset()
+        if self.depth_filter is not None:
+            self.depth_filter.reset()
         return None, None
         
+    def estimate_gaze(self):
+        self.gaze_estimator.estimate(self.landmarks, out=self.gaze)
+        self.gaze_valid[:] = self.gaze_estimator.valid
+        if self.calibration is not None and self.calibration.has_transform():
+            self.gaze[:] = self.gaze @ self.calibration.rotation.T
+
+    def get_gaze(self):
+        # per-eye unit gaze vectors in the same frame as the eye positions, None for a closed eye
+        left_gaze = self.gaze[0] if self.gaze_valid[0] else None
+        right_gaze = self.gaze[1] if self.gaze_valid[1] else None
+        return left_gaze, right_gaze
+
+    def estimate_head_pose(self):
+        self.transform_landmarks_to_uv(self.landmarks, HEAD_LANDMARKS, out=self.head_points)
+        x, y = self.transform_uv_to_norm_image_coords(self.head_points[:, 0], self.head_points[:, 1])
+        # solvePnP wants the OpenCV camera convention, y down
+        self.head_norm_coords[:, 0] = x
+        np.negative(y, out=self.head_norm_coords[:, 1])
+        # the model origin sits between the eyes, so their depth fixes the model scale
+        depth = self.eyes[:, 2].mean() if np.all(self.eyes[:, 2] > 0) else None
+        rotation, position = self.head_pose_estimator.estimate(self.head_norm_coords, depth)
+        self.head_pose_valid = rotation is not None
+        if not self.head_pose_valid:
+            return
+        if self.calibration is not None and self.calibration.has_transform():
+            rotation = self.calibration.rotation @ rotation
+            if np.linalg.det(rotation) < 0:
+                # the head frame changes handedness with the world frame
+                rotation = rotation @ CAMERA_TO_RIGHT_HANDED
+            position = self.calibration.transform_points(position)
+        self.head_position[:] = position
+        self.head_rotation[:] = rotation_to_quaternion(rotation)
+
+    def get_head_pose(self):
+        # head position and (x, y, z, w) quaternion in the same frame as the eye positions
+        if not self.head_pose_valid:
+            return None, None
+        return self.head_position, self.head_rotation
+
     def get_color_image(self):
-        return self.color_image
+        return self.display_image
 
     def stop(self):
         if self.pipeline_started:
             self.pipeline_started = False
             self.pipeline.stop()
             print("pipeline stopped.")
-        if self.face_mesh:
-            self.face_mesh.close()
\ No newline at end of file
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
\ No newline at end of file
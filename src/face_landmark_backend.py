@@ -0,0 +1,401 @@
+import os
+import numpy as np
+import cv2
+
+
+LANDMARK_COUNT = 478
+BACKENDS = ["mediapipe", "onnx", "tflite"]
+# model files in model_dir, named as in the mediapipe package (modules/face_detection, face_landmark, iris_landmark)
+# face_landmark_with_attention is not usable, it needs custom ops that only MediaPipe registers
+DETECTOR_MODEL = "face_detection_short_range"
+LANDMARK_MODEL = "face_landmark"
+IRIS_MODEL = "iris_landmark"
+MODEL_NAMES = (DETECTOR_MODEL, LANDMARK_MODEL, IRIS_MODEL)
+MODEL_EXTENSIONS = {"onnx": ".onnx", "tflite": ".tflite"}
+
+ROI_SCALE = 1.5
+# after a loss, search this much around the last face for REACQUIRE_ATTEMPTS frames before full-frame detection
+REACQUIRE_ROI_SCALE = 2.0
+REACQUIRE_ATTEMPTS = 10
+# eye keypoints/landmarks used to align the roi, as in the MediaPipe graphs
+DETECTION_ROTATION_KEYPOINTS = (0, 1)
+LANDMARK_ROTATION_INDICES = (33, 263)
+# eye corners of the mesh, left then right eye: they set the iris roi and lend their depth to the iris landmarks
+EYE_CORNER_INDICES = ((33, 133), (362, 263))
+# iris roi size relative to the eye width, as in the MediaPipe iris graph
+IRIS_ROI_SCALE = 2.3
+# iris contour order of the mirrored right eye crop, back to the FaceMesh order
+MIRRORED_IRIS_ORDER = [0, 3, 2, 1, 4]
+
+
+class FaceLandmarkBackend:
+    # landmarks are returned as a (478, 3) array of normalized x, y, z like MediaPipe FaceMesh
+    # confidence is the face presence score of the last processed image
+    confidence = 0.0
+
+    def process(self, image):
+        raise NotImplementedError
+
+    def process_batch(self, images):
+        return [self.process(image) for image in images]
+
+    def draw(self, image):
+        pass
+
+    def reset(self):
+        # forget the tracked face, e.g. when the image size changes
+        pass
+
+    def close(self):
+        pass
+
+
+class MediaPipeBackend(FaceLandmarkBackend):
+    def __init__(self, min_detection_confidence=0.3, min_tracking_confidence=0.5):
+        import mediapipe
+        self.mp_face_mesh = mediapipe.solutions.face_mesh
+        self.mp_drawing = mediapipe.solutions.drawing_utils
+        self.mp_drawing_styles = mediapipe.solutions.drawing_styles
+        self.face_mesh = self.mp_face_mesh.FaceMesh(
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+        self.face_landmarks = None
+        self.landmarks = np.zeros((LANDMARK_COUNT, 3), dtype=np.float64)
+
+    def process(self, image):
+        results = self.face_mesh.process(image)
+        if not results.multi_face_landmarks:
+            self.face_landmarks = None
+            self.confidence = 0.0
+            return None
+        self.face_landmarks = results.multi_face_landmarks[0]
+        # the legacy solution API only reports faces above min_tracking_confidence, without a score,
+        # and redetects lost faces on the full frame, so the reacquisition logic does not apply to it
+        self.confidence = 1.0
+        self.landmarks[:] = [(p.x, p.y, p.z) for p in self.face_landmarks.landmark]
+        return self.landmarks
+
+    def draw(self, image):
+        if self.face_landmarks is None:
+            return
+        self.mp_drawing.draw_landmarks(
+            image=image,
+            landmark_list=self.face_landmarks,
+            connections=self.mp_face_mesh.FACEMESH_TESSELATION,
+            landmark_drawing_spec=None,
+            connection_drawing_spec=self.mp_drawing_styles.get_default_face_mesh_tesselation_style()
+        )
+        self.mp_drawing.draw_landmarks(
+            image=image,
+            landmark_list=self.face_landmarks,
+            connections=self.mp_face_mesh.FACEMESH_CONTOURS,
+            landmark_drawing_spec=None,
+            connection_drawing_spec=self.mp_drawing_styles.get_default_face_mesh_contours_style()
+        )
+        self.mp_drawing.draw_landmarks(
+            image=image,
+            landmark_list=self.face_landmarks,
+            connections=self.mp_face_mesh.FACEMESH_IRISES,
+            landmark_drawing_spec=None,
+            connection_drawing_spec=self.mp_drawing_styles.get_default_face_mesh_iris_connections_style()
+        )
+
+    def close(self):
+        self.face_mesh.close()
+
+
+class _OnnxModel:
+    def __init__(self, path, num_threads, max_batch):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_names = [o.name for o in self.session.get_outputs()]
+        shape = model_input.shape
+        self.is_nchw = shape[1] == 3
+        self.height, self.width = (shape[2], shape[3]) if self.is_nchw else (shape[1], shape[2])
+        self.supports_batch = not isinstance(shape[0], int)
+        if self.is_nchw:
+            self.input = np.zeros((max_batch, 3, self.height, self.width), dtype=np.float32)
+        else:
+            self.input = np.zeros((max_batch, self.height, self.width, 3), dtype=np.float32)
+
+    def run(self, count):
+        if self.supports_batch:
+            outputs = self.session.run(None, {self.input_name: self.input[:count]})
+        else:
+            results = [self.session.run(None, {self.input_name: self.input[i:i+1]}) for i in range(count)]
+            outputs = [np.concatenate(o) for o in zip(*results)]
+        return dict(zip(self.output_names, outputs))
+
+
+class _TFLiteModel:
+    def __init__(self, path, num_threads, max_batch):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        model_input = self.interpreter.get_input_details()[0]
+        self.input_index = model_input["index"]
+        _, self.height, self.width, _ = model_input["shape"]
+        self.supports_batch = False
+        if max_batch > 1:
+            try:
+                self.interpreter.resize_tensor_input(self.input_index, [max_batch, self.height, self.width, 3])
+                self.supports_batch = True
+            except Exception:
+                pass
+        self.interpreter.allocate_tensors()
+        self.output_details = self.interpreter.get_output_details()
+        if self.supports_batch and any(d["shape"][0] != max_batch for d in self.output_details):
+            # a reshape with a fixed batch of 1 folds the batch into the features, run the images one by one
+            self.interpreter.resize_tensor_input(self.input_index, [1, self.height, self.width, 3])
+            self.interpreter.allocate_tensors()
+            self.output_details = self.interpreter.get_output_details()
+            self.supports_batch = False
+        self.is_nchw = False
+        self.input = np.zeros((max_batch, self.height, self.width, 3), dtype=np.float32)
+
+    def run(self, count):
+        if self.supports_batch:
+            # a resized interpreter always runs the full batch
+            self.interpreter.set_tensor(self.input_index, self.input)
+            self.interpreter.invoke()
+            return {d["name"]: self.interpreter.get_tensor(d["index"])[:count] for d in self.output_details}
+        results = []
+        for i in range(count):
+            self.interpreter.set_tensor(self.input_index, self.input[i:i+1])
+            self.interpreter.invoke()
+            results.append([self.interpreter.get_tensor(d["index"]) for d in self.output_details])
+        return {d["name"]: np.concatenate(o) for d, o in zip(self.output_details, zip(*results))}
+
+
+def _set_input(model, index, image, scale, offset):
+    # write into the preallocated input tensor without temporaries
+    dst = model.input[index]
+    src = image.transpose(2, 0, 1) if model.is_nchw else image
+    np.multiply(src, scale, out=dst, casting="unsafe")
+    dst += offset
+
+
+def _generate_anchors():
+    # SSD anchors of the short range BlazeFace model (128x128 input, fixed anchor size)
+    anchors = []
+    for stride, count in ((8, 2), (16, 6)):
+        grid = 128 // stride
+        y, x = np.mgrid[0:grid, 0:grid]
+        centers = np.stack(((x + 0.5) / grid, (y + 0.5) / grid), axis=-1).reshape(-1, 1, 2)
+        anchors.append(np.repeat(centers, count, axis=1).reshape(-1, 2))
+    return np.concatenate(anchors)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -80.0, 80.0)))
+
+
+def _roi_matrix(center, size, angle, output_size):
+    # affine transform from the image to a square roi rotated by angle
+    cos = np.cos(angle)
+    sin = np.sin(angle)
+    scale = output_size / size
+    matrix = np.array([
+        [cos * scale, sin * scale, 0.0],
+        [-sin * scale, cos * scale, 0.0]
+    ])
+    matrix[:, 2] = output_size / 2 - matrix[:, :2] @ center
+    return matrix
+
+
+def _rotation(start, end):
+    # angle that brings the start->end vector to horizontal
+    angle = -np.arctan2(-(end[1] - start[1]), end[0] - start[0])
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+class RuntimeBackend(FaceLandmarkBackend):
+    # face_landmark gives the 468 mesh points, iris_landmark then runs on both eyes of every face in one batch
+    # process_batch() keeps face state per image slot, but every EyeTracker owns a backend with max_batch 1,
+    # so no caller batches images across cameras; the only batch is the two eyes of the face, which still
+    # run one by one on models with a fixed batch of 1 like the iris_landmark file from MediaPipe
+    def __init__(self, runtime, model_dir, num_threads=1, max_batch=1, min_detection_confidence=0.3, min_tracking_confidence=0.5):
+        model_class = _OnnxModel if runtime == "onnx" else _TFLiteModel
+        extension = MODEL_EXTENSIONS[runtime]
+        self.detector = model_class(os.path.join(model_dir, DETECTOR_MODEL + extension), num_threads, max_batch)
+        self.landmark_model = model_class(os.path.join(model_dir, LANDMARK_MODEL + extension), num_threads, max_batch)
+        self.iris_model = model_class(os.path.join(model_dir, IRIS_MODEL + extension), num_threads, 2 * max_batch)
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.max_batch = max_batch
+        self.anchors = _generate_anchors()
+        # per-stream state, preallocated so the steady state does not allocate
+        self.rois = [None] * max_batch
+        self.last_rois = [None] * max_batch
+        self.reacquire_attempts = [0] * max_batch
+        self.confidences = [0.0] * max_batch
+        self.matrices = [None] * max_batch
+        self.eye_matrices = [None] * (2 * max_batch)
+        self.landmarks = np.zeros((max_batch, LANDMARK_COUNT, 3), dtype=np.float64)
+        self.has_landmarks = [False] * max_batch
+        self.detector_crop = None
+        self.landmark_crop = np.zeros((self.landmark_model.height, self.landmark_model.width, 3), dtype=np.uint8)
+        self.eye_crop = np.zeros((self.iris_model.height, self.iris_model.width, 3), dtype=np.uint8)
+
+    def process(self, image):
+        return self.process_batch([image])[0]
+
+    def process_batch(self, images):
+        count = len(images)
+        if count > self.max_batch:
+            raise ValueError(f"batch size {count} exceeds max_batch {self.max_batch}")
+        for i in range(count):
+            if self.rois[i] is None and self.last_rois[i] is not None and self.reacquire_attempts[i] < REACQUIRE_ATTEMPTS:
+                self.reacquire_attempts[i] += 1
+                center, size, _ = self.last_rois[i]
+                self.rois[i] = self._detect(images[i], center, size * REACQUIRE_ROI_SCALE)
+            elif self.rois[i] is None:
+                self.rois[i] = self._detect(images[i])
+        active = [i for i in range(count) if self.rois[i] is not None]
+        for i in active:
+            center, size, angle = self.rois[i]
+            self.matrices[i] = _roi_matrix(center, size, angle, self.landmark_model.width)
+            cv2.warpAffine(images[i], self.matrices[i], (self.landmark_model.width, self.landmark_model.height), dst=self.landmark_crop)
+            _set_input(self.landmark_model, i, self.landmark_crop, 1.0 / 255.0, 0.0)
+        outputs = self.landmark_model.run(count) if len(active) > 0 else None
+
+        faces = [i for i in active if self._decode_mesh(outputs, i)]
+        for i in faces:
+            for eye in range(2):
+                self._set_eye_input(images[i], i, eye)
+        iris_outputs = self.iris_model.run(2 * count) if len(faces) > 0 else None
+
+        results = []
+        for i in range(count):
+            self.has_landmarks[i] = i in faces and self._decode_irises(iris_outputs, i, images[i].shape)
+            if self.has_landmarks[i]:
+                self.last_rois[i] = self.rois[i]
+                self.reacquire_attempts[i] = 0
+            else:
+                self.rois[i] = None
+                self.confidences[i] = 0.0
+            results.append(self.landmarks[i] if self.has_landmarks[i] else None)
+        self.confidence = self.confidences[0]
+        return results
+
+    def reset(self):
+        for i in range(self.max_batch):
+            self.rois[i] = None
+            self.last_rois[i] = None
+            self.reacquire_attempts[i] = 0
+
+    def _detect(self, image, center=None, side=None):
+        # without a search region the whole frame is letterboxed into the detector input
+        if center is None:
+            height, width = image.shape[:2]
+            center = np.array((width / 2, height / 2))
+            side = max(width, height)
+        if self.detector_crop is None or self.detector_crop.shape[:2] != (self.detector.height, self.detector.width):
+            self.detector_crop = np.zeros((self.detector.height, self.detector.width, 3), dtype=np.uint8)
+        matrix = _roi_matrix(center, side, 0.0, self.detector.width)
+        cv2.warpAffine(image, matrix, (self.detector.width, self.detector.height), dst=self.detector_crop)
+        _set_input(self.detector, 0, self.detector_crop, 2.0 / 255.0, -1.0)
+        outputs = list(self.detector.run(1).values())
+        regressors = next(o for o in outputs if o.shape[-1] == 16)[0]
+        scores = _sigmoid(next(o for o in outputs if o.shape[-1] == 1)[0, :, 0])
+        best = int(np.argmax(scores))
+        if scores[best] < self.min_detection_confidence:
+            return None
+        raw = regressors[best] / self.detector.width
+        box_center = raw[0:2] + self.anchors[best]
+        box_size = raw[2:4]
+        keypoints = raw[4:].reshape(-1, 2) + self.anchors[best]
+        # back from the detector's [0, 1] coords to image pixels
+        box_center = (box_center - 0.5) * side + center
+        keypoints = (keypoints - 0.5) * side + center
+        angle = _rotation(keypoints[DETECTION_ROTATION_KEYPOINTS[0]], keypoints[DETECTION_ROTATION_KEYPOINTS[1]])
+        return box_center, max(box_size) * side * ROI_SCALE, angle
+
+    def _decode_mesh(self, outputs, index):
+        mesh = flag = None
+        for output in outputs.values():
+            values = output[index].reshape(-1)
+            if values.size == 1404:
+                mesh = values.reshape(-1, 3)
+            elif values.size == 1:
+                flag = values[0]
+        if mesh is None:
+            return False
+        confidence = _sigmoid(flag) if flag is not None else 1.0
+        if confidence < self.min_tracking_confidence:
+            return False
+        self.confidences[index] = float(confidence)
+
+        # mesh in image pixels until _decode_irises normalizes it
+        inverse = cv2.invertAffineTransform(self.matrices[index])
+        landmarks = self.landmarks[index]
+        landmarks[:468, :2] = mesh[:, :2] @ inverse[:, :2].T + inverse[:, 2]
+        landmarks[:468, 2] = mesh[:, 2] * np.hypot(*inverse[0, :2])
+
+        # next roi follows the landmarks, as in the MediaPipe tracking loop
+        points = landmarks[:468, :2]
+        low = points.min(axis=0)
+        high = points.max(axis=0)
+        angle = _rotation(points[LANDMARK_ROTATION_INDICES[0]], points[LANDMARK_ROTATION_INDICES[1]])
+        self.rois[index] = ((low + high) / 2, max(high - low) * ROI_SCALE, angle)
+        return True
+
+    def _set_eye_input(self, image, index, eye):
+        # square roi around the eye corners, rotated level with them
+        start, end = self.landmarks[index, list(EYE_CORNER_INDICES[eye]), :2]
+        size = max(abs(end - start)) * IRIS_ROI_SCALE
+        matrix = _roi_matrix((start + end) / 2, size, _rotation(start, end), self.iris_model.width)
+        if eye == 1:
+            # the iris model is trained on left eyes, the right one is mirrored
+            matrix[0] = -matrix[0]
+            matrix[0, 2] += self.iris_model.width
+        self.eye_matrices[2 * index + eye] = matrix
+        cv2.warpAffine(image, matrix, (self.iris_model.width, self.iris_model.height), dst=self.eye_crop)
+        _set_input(self.iris_model, 2 * index + eye, self.eye_crop, 1.0 / 255.0, 0.0)
+
+    def _decode_irises(self, outputs, index, shape):
+        # the 71 eye contour points are not used, the mesh keeps its own eyelids
+        iris = next((o for o in outputs.values() if o[0].size == 15), None)
+        if iris is None:
+            return False
+        landmarks = self.landmarks[index]
+        for eye in range(2):
+            inverse = cv2.invertAffineTransform(self.eye_matrices[2 * index + eye])
+            points = iris[2 * index + eye].reshape(-1, 3)[:, :2]
+            if eye == 1:
+                points = points[MIRRORED_IRIS_ORDER]
+            offset = 468 + 5 * eye
+            landmarks[offset:offset + 5, :2] = points @ inverse[:, :2].T + inverse[:, 2]
+            landmarks[offset:offset + 5, 2] = landmarks[list(EYE_CORNER_INDICES[eye]), 2].mean()
+
+        height, width = shape[:2]
+        landmarks[:, 0] /= width
+        landmarks[:, 1] /= height
+        landmarks[:, 2] /= width
+        return True
+
+    def draw(self, image):
+        height, width = image.shape[:2]
+        if not self.has_landmarks[0]:
+            return
+        for x, y, _ in self.landmarks[0]:
+            cv2.circle(image, (int(x * width), int(y * height)), 1, (0, 255, 0), -1)
+
+
+def create_backend(name="mediapipe", model_dir="", num_threads=1, max_batch=1, min_detection_confidence=0.3, min_tracking_confidence=0.5):
+    if name == "mediapipe":
+        return MediaPipeBackend(min_detection_confidence, min_tracking_confidence)
+    if name in MODEL_EXTENSIONS:
+        return RuntimeBackend(name, model_dir, num_threads, max_batch, min_detection_confidence, min_tracking_confidence)
+    raise ValueError(f"unknown backend: {name}")
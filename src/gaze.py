@@ -0,0 +1,56 @@
+import numpy as np
+
+
+# per eye, in the order of IRIS_LANDMARKS: iris centre, eye corners and eyelids
+IRIS_CENTERS = [468, 473]
+EYE_CORNERS = [[33, 133], [362, 263]]
+EYELIDS = [[159, 145], [386, 374]]
+# head axes from the face mesh: left to right eye corner, chin to forehead
+HEAD_X_AXIS = (33, 263)
+HEAD_Y_AXIS = (152, 10)
+
+# eyeball geometry relative to the corner-to-corner eye width (about 12 mm / 29 mm)
+EYEBALL_RADIUS_RATIO = 0.42
+# eyeball centre behind the midpoint of the corners and eyelids
+EYEBALL_DEPTH_RATIO = 0.25
+# eyelid gap relative to the eye width below which the eye counts as closed
+MIN_EYE_OPENNESS = 0.08
+
+
+class GazeEstimator:
+    def __init__(self, width, height):
+        # landmarks are normalized by width for x and z, by height for y
+        self.scale = np.array((width, height, width), dtype=np.float64)
+        self.valid = np.zeros(2, dtype=bool)
+
+    def estimate(self, landmarks, out=None):
+        # unit gaze vectors (2, 3) in the camera frame: x right, y up, z away from the camera
+        points = landmarks * self.scale
+        corners = points[EYE_CORNERS]
+        lids = points[EYELIDS]
+        iris = points[IRIS_CENTERS]
+
+        head_x = points[HEAD_X_AXIS[1]] - points[HEAD_X_AXIS[0]]
+        head_y = points[HEAD_Y_AXIS[1]] - points[HEAD_Y_AXIS[0]]
+        # forward points out of the face, towards the camera (landmark z grows away from it)
+        forward = np.cross(head_x, head_y)
+        forward /= np.linalg.norm(forward)
+
+        width = np.linalg.norm(corners[:, 1] - corners[:, 0], axis=-1)
+        openness = np.linalg.norm(lids[:, 1, :2] - lids[:, 0, :2], axis=-1) / width
+        self.valid[:] = openness > MIN_EYE_OPENNESS
+
+        center = (corners.sum(axis=1) + lids.sum(axis=1)) / 4
+        center -= forward * (EYEBALL_DEPTH_RATIO * width)[:, None]
+        radius = EYEBALL_RADIUS_RATIO * width
+
+        # put the iris on the eyeball sphere, on the side facing the camera
+        d = iris[:, :2] - center[:, :2]
+        dz = np.sqrt(np.maximum(radius ** 2 - np.sum(d * d, axis=-1), 0.0))
+        gaze = np.empty((2, 3), dtype=np.float64) if out is None else out
+        gaze[:, :2] = d
+        gaze[:, 2] = -dz
+        gaze /= np.linalg.norm(gaze, axis=-1, keepdims=True)
+        # image y points down, the output y up
+        gaze[:, 1] *= -1
+        return gaze
@@ -0,0 +1,86 @@
+import numpy as np
+import cv2
+
+
+# fixed landmark subset: outer and inner eye corners, nose tip, chin and mouth corners
+HEAD_LANDMARKS = [33, 263, 133, 362, 1, 152, 61, 291]
+# generic face model in m, origin between the outer eye corners, x right, y down, z into the head
+FACE_MODEL = np.array([
+    [-0.045, 0.000, 0.000],
+    [0.045, 0.000, 0.000],
+    [-0.015, 0.000, -0.005],
+    [0.015, 0.000, -0.005],
+    [0.000, 0.034, -0.027],
+    [0.000, 0.100, -0.014],
+    [-0.030, 0.064, -0.002],
+    [0.030, 0.064, -0.002],
+], dtype=np.float64)
+# flips between the OpenCV camera frame (y down) and the tracker frame (y up)
+FLIP_Y = np.diag((1.0, -1.0, 1.0))
+
+
+def rotation_to_quaternion(rotation):
+    # (x, y, z, w) of a proper rotation matrix
+    trace = np.trace(rotation)
+    if trace > 0:
+        s = 2.0 * np.sqrt(trace + 1.0)
+        w = s / 4
+        x = (rotation[2, 1] - rotation[1, 2]) / s
+        y = (rotation[0, 2] - rotation[2, 0]) / s
+        z = (rotation[1, 0] - rotation[0, 1]) / s
+    elif rotation[0, 0] > rotation[1, 1] and rotation[0, 0] > rotation[2, 2]:
+        s = 2.0 * np.sqrt(1.0 + rotation[0, 0] - rotation[1, 1] - rotation[2, 2])
+        w = (rotation[2, 1] - rotation[1, 2]) / s
+        x = s / 4
+        y = (rotation[0, 1] + rotation[1, 0]) / s
+        z = (rotation[0, 2] + rotation[2, 0]) / s
+    elif rotation[1, 1] > rotation[2, 2]:
+        s = 2.0 * np.sqrt(1.0 + rotation[1, 1] - rotation[0, 0] - rotation[2, 2])
+        w = (rotation[0, 2] - rotation[2, 0]) / s
+        x = (rotation[0, 1] + rotation[1, 0]) / s
+        y = s / 4
+        z = (rotation[1, 2] + rotation[2, 1]) / s
+    else:
+        s = 2.0 * np.sqrt(1.0 + rotation[2, 2] - rotation[0, 0] - rotation[1, 1])
+        w = (rotation[1, 0] - rotation[0, 1]) / s
+        x = (rotation[0, 2] + rotation[2, 0]) / s
+        y = (rotation[1, 2] + rotation[2, 1]) / s
+        z = s / 4
+    return np.array((x, y, z, w))
+
+
+class HeadPoseEstimator:
+    def __init__(self):
+        self.rvec = np.zeros((3, 1), dtype=np.float64)
+        self.tvec = np.zeros((3, 1), dtype=np.float64)
+        self.has_guess = False
+        self.camera_matrix = np.eye(3)
+        self.rotation = np.eye(3)
+        self.position = np.zeros(3)
+
+    def reset(self):
+        # drop the warm start, e.g. after the face was lost
+        self.has_guess = False
+
+    def estimate(self, image_points, depth=None):
+        # image_points: (8, 2) undistorted normalized coords of HEAD_LANDMARKS, y down
+        # returns rotation and position in the tracker frame (x right, y up, z away from the camera)
+        if self.has_guess:
+            ok, self.rvec, self.tvec = cv2.solvePnP(
+                FACE_MODEL, image_points, self.camera_matrix, None,
+                self.rvec, self.tvec, useExtrinsicGuess=True, flags=cv2.SOLVEPNP_ITERATIVE
+            )
+        else:
+            ok, self.rvec, self.tvec = cv2.solvePnP(FACE_MODEL, image_points, self.camera_matrix, None, flags=cv2.SOLVEPNP_EPNP)
+        if not ok or self.tvec[2, 0] <= 0:
+            self.has_guess = False
+            return None, None
+        self.has_guess = True
+
+        rotation, _ = cv2.Rodrigues(self.rvec)
+        self.rotation[:] = FLIP_Y @ rotation @ FLIP_Y
+        self.position[:] = FLIP_Y @ self.tvec[:, 0]
+        if depth is not None and depth > 0:
+            # the model scale is generic, the measured depth fixes the distance along the same ray
+            self.position *= depth / self.position[2]
+        return self.rotation, self.position
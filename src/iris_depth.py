@@ -0,0 +1,61 @@
+import numpy as np
+
+
+IRIS_SIZE = 0.0117 # m
+IRIS_SIZE_REL_STD = 0.04 # inter-subject spread of the iris diameter
+LANDMARK_NOISE = 0.5 # px
+SENSOR_DEPTH_NOISE = 0.005 # 1/m, RMS error grows with depth^2
+SENSOR_DEPTH_RANGE = (0.1, 3.0) # m
+# antipodal contour points within each eye's iris landmarks (centre first)
+IRIS_CONTOUR_PAIRS = ((1, 3), (2, 4))
+
+
+class IrisDepthEstimator:
+    def __init__(self, iris_size=IRIS_SIZE, pixel_scale=1.0, iris_size_rel_std=IRIS_SIZE_REL_STD):
+        self.iris_size = iris_size
+        self.iris_size_rel_std = iris_size_rel_std
+        # focal length in pixels, converts normalized residuals to pixel noise
+        self.pixel_scale = pixel_scale
+
+    def fit_diameter(self, iris):
+        # iris: (eyes, 5, 2) normalized image coords, centre followed by the right, top, left and bottom
+        # contour points; the two antipodal pairs only determine two diameters, not a full ellipse
+        iris = np.asarray(iris, dtype=np.float64)
+        horizontal = np.linalg.norm(iris[:, IRIS_CONTOUR_PAIRS[0][0]] - iris[:, IRIS_CONTOUR_PAIRS[0][1]], axis=-1)
+        vertical = np.linalg.norm(iris[:, IRIS_CONTOUR_PAIRS[1][0]] - iris[:, IRIS_CONTOUR_PAIRS[1][1]], axis=-1)
+        noise = LANDMARK_NOISE / self.pixel_scale
+        # half the difference has the landmark noise as its std, only the part above it counts
+        # as foreshortening, so the major axis is taken when the eye is turned away
+        excess = np.maximum(np.abs(horizontal - vertical) / 2 - noise, 0.0)
+        diameter = (horizontal + vertical) / 2 + excess
+        with np.errstate(all="ignore"):
+            # the mean of two diameters has the landmark noise as its std, a single diameter sqrt(2) times it
+            rel_std = np.where(excess > 0, np.sqrt(2.0), 1.0) * noise / diameter
+        rel_std = np.where(diameter > 0, rel_std, np.inf)
+        return diameter, rel_std
+
+    def estimate(self, iris):
+        diameter, rel_std = self.fit_diameter(iris)
+        with np.errstate(all="ignore"):
+            depth = self.iris_size / diameter
+            sigma = depth * (self.iris_size_rel_std + rel_std)
+        valid = np.isfinite(depth) & (depth > 0)
+        depth = np.where(valid, depth, 0.0)
+        sigma = np.where(valid, sigma, np.inf)
+        return depth, sigma
+
+    def fuse(self, iris, sensor_depth):
+        iris_depth, iris_sigma = self.estimate(iris)
+        sensor_depth = np.asarray(sensor_depth, dtype=np.float64)
+        sensor_valid = (sensor_depth > SENSOR_DEPTH_RANGE[0]) & (sensor_depth < SENSOR_DEPTH_RANGE[1])
+        sensor_sigma = np.where(sensor_valid, SENSOR_DEPTH_NOISE * sensor_depth ** 2, np.inf)
+
+        # inverse-variance weighting, an invalid source gets zero weight
+        w_iris = 1.0 / iris_sigma ** 2
+        w_sensor = 1.0 / sensor_sigma ** 2
+        w_sum = w_iris + w_sensor
+        with np.errstate(all="ignore"):
+            depth = (w_iris * iris_depth + w_sensor * np.where(sensor_valid, sensor_depth, 0.0)) / w_sum
+            sigma = 1.0 / np.sqrt(w_sum)
+        valid = w_sum > 0
+        return np.where(valid, depth, 0.0), np.where(valid, sigma, np.inf)
@@ -0,0 +1,80 @@
+import sys
+import time
+import multiprocessing
+from tracking import create_tracker
+from osc_sender import OSCSender
+from tracking_state import TRACKING
+from simulated_camera import SIMULATED_SERIAL_PREFIX
+
+DEFAULT_STREAMS = 4
+DEFAULT_DURATION = 30 # s
+BASE_PORT = 9000
+
+
+def run_stream(index, width, height, fps, duration, realtime, backend, model_dir):
+    # one headless tracker on a simulated camera, sending OSC to localhost like main() does
+    serial = f"{SIMULATED_SERIAL_PREFIX}{index}"
+    tracker = create_tracker(serial, width=width, height=height, fps=fps, backend=backend, model_dir=model_dir)
+    sender = OSCSender("127.0.0.1", BASE_PORT + index)
+    stats = {"serial": serial, "frames": 0, "tracked": 0, "dropped": 0, "latency": 0.0, "cpu": 0.0, "elapsed": 0.0}
+    if not tracker.start():
+        return stats
+    tracker.pipeline.realtime = realtime
+    try:
+        start_time = time.perf_counter()
+        start_cpu = time.process_time()
+        latency = 0.0
+        while time.perf_counter() - start_time < duration:
+            left_eye, right_eye = tracker.get_eye_position()
+            if tracker.finished:
+                break
+            if left_eye is not None and right_eye is not None:
+                sender.send_eye_position(left_eye, right_eye)
+                sender.send_gaze(*tracker.get_gaze())
+                sender.send_head_pose(*tracker.get_head_pose())
+            sender.send_tracking_state(tracker.tracking_state.state, tracker.tracking_state.confidence)
+            # time from frame capture to results sent, including any wait in the frame queue
+            latency += time.time() - tracker.frame_timestamp / 1000
+            stats["frames"] += 1
+            if tracker.tracking_state.state == TRACKING:
+                stats["tracked"] += 1
+        stats["elapsed"] = time.perf_counter() - start_time
+        stats["cpu"] = time.process_time() - start_cpu - tracker.pipeline.render_time
+        stats["latency"] = latency
+        stats["dropped"] = tracker.pipeline.dropped_count
+    finally:
+        tracker.stop()
+    return stats
+
+def print_stats(results):
+    # cpu excludes rendering the synthetic frames
+    print("serial      fps  tracked  dropped  latency ms  cpu ms/frame  cpu %")
+    for stats in results:
+        frames = max(stats["frames"], 1)
+        elapsed = max(stats["elapsed"], 1e-9)
+        print(
+            f"{stats['serial']:<8} {stats['frames'] / elapsed:6.1f} {stats['tracked'] / frames * 100:7.1f}% {stats['dropped']:8d}"
+            f" {stats['latency'] / frames * 1000:11.1f} {stats['cpu'] / frames * 1000:13.2f} {stats['cpu'] / elapsed * 100:6.1f}"
+        )
+    total = sum(stats["frames"] / max(stats["elapsed"], 1e-9) for stats in results)
+    print(f"total: {total:.1f} fps over {len(results)} streams")
+
+def generate_load(streams, width, height, fps, duration, realtime=True, backend="mediapipe", model_dir=""):
+    args = [(i, width, height, fps, duration, realtime, backend, model_dir) for i in range(streams)]
+    with multiprocessing.Pool(streams) as pool:
+        results = pool.starmap(run_stream, args)
+    print_stats(results)
+    return results
+
+
+if __name__ == "__main__":
+    # python load_generator.py [streams] [seconds] [width height fps] [--unthrottled]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    realtime = "--unthrottled" not in sys.argv
+    if not all(arg.isdigit() for arg in args) or len(args) not in (0, 1, 2, 5):
+        print("usage: python load_generator.py [streams] [seconds] [width height fps] [--unthrottled]")
+        sys.exit(1)
+    streams = int(args[0]) if len(args) > 0 else DEFAULT_STREAMS
+    duration = int(args[1]) if len(args) > 1 else DEFAULT_DURATION
+    width, height, fps = (int(arg) for arg in args[2:5]) if len(args) == 5 else (640, 480, 60)
+    generate_load(streams, width, height, fps, duration, realtime)
@@ -1,90 +1,99 @@
-import sys
 import os
+import sys
 import time
-import tempfile
 import glob
-import msvcrt
+import json
+import multiprocessing
 import cv2
-from config import Config
-from eye_tracker import EyeTracker
+import numpy as np
+from config import Config, load_config, load_configs, create_default_config
+from tracking import create_tracker, process_recording
 from osc_sender import OSCSender
 from fps_timer import FPSTimer
+from buffer_pool import AllocationMonitor
+from tracking_state import TRACKING
+from device_lock import DeviceLock, query_device_locks, LOCK_DIR
+from calibration import Calibration, CalibrationCache, IrisSizeCalibrator, estimate_rigid_transform
+
+if os.name == "nt":
+    import msvcrt
 
 WINDOW_NAME = "Eye Tracker"
+CALIBRATION_FRAME_COUNT = 30
+# time to collect CALIBRATION_FRAME_COUNT tracked frames at a calibration point
+CALIBRATION_POINT_TIMEOUT = 10.0 # s
 
-def check_serial_from_tmp_file(path,serial):
-    try:
-        with open(path, "r+") as f:
-            used_serials = f.readlines()
-            used_serials = [s.strip() for s in used_serials]
-            if serial in used_serials:
-                print("This camera is already in use.")
-                return False
-            else:
-                f.write(serial + "\n")
-                return True
-    except FileNotFoundError:
-        with open(path, "w") as f:
-            f.write(serial + "\n")
-            return True
-        
-def remove_serial_from_tmp_file(path,serial):
-    try:
-        with open(path, "r") as f:
-            used_serials = f.readlines()
-            used_serials = [s.strip() for s in used_serials]
-            if serial in used_serials:
-                used_serials.remove(serial)
-                with open(path, "w") as f:
-                    for s in used_serials:
-                        f.write(s + "\n")
-    except FileNotFoundError:
-        pass
-    
-def main(path,serial=None,port=None,is_flip=False):
-    config = Config(serial, port, is_flip)
-    result = config.load_config(path)
-    if not result:
+def acquire_device(device_lock):
+    if not device_lock.acquire():
+        print("This camera is already in use.")
+        print(f"Failed to use the camera S/N: {device_lock.serial} (PID: {device_lock.get_owner()})")
+        return False
+    print(f"Succeeded to lock the camera S/N: {device_lock.serial}")
+    print(f"lock file path: {device_lock.path}")
+    return True
+
+def print_device_usage():
+    serials = Config.load_serials_from_connected_devices()
+    names = Config.load_names_from_connected_devices()
+    print(f"lock directory: {LOCK_DIR}")
+    for serial, pid in query_device_locks(serials).items():
+        name = names[serials.index(serial)] if serial in serials else "(not connected)"
+        status = f"in use by PID {pid}" if pid is not None else "free"
+        print(f"{name} {serial}: {status}")
+
+def main(config):
+    if config is None:
         print("Failed to load config.")
         return
     
-    temp_file_path = os.path.join(tempfile.gettempdir(), 'RealSenseEyeTracker_device_usage.txt')
-    print("There is a temp file to check the device usage.")
-    print(f"temp file path: {temp_file_path}")
-    
-    if not check_serial_from_tmp_file(temp_file_path,config.serial):
-        print(f"Failed to use the camera S/N: {config.serial}")
+    device_lock = DeviceLock(config.serial)
+    if not acquire_device(device_lock):
         return
-    print("Succeeded to check the device usage.")
     
-    tracker = EyeTracker(
-        config.serial,
-        config.width,
-        config.height,
-        config.fps,
-        config.is_flip,
-        config.enable_depth_estimation
-    )
-    sender = OSCSender(config.ip, config.port)
-    if config.print_fps:
+    calibration = CalibrationCache().load(config.serial, config.user)
+    if calibration is not None:
+        print(f"Loaded calibration for S/N: {config.serial}, user: {config.user}")
+    tracker = create_tracker(config, calibration)
+    sender = OSCSender(config.ip, config.port, calibration is not None and calibration.has_transform())
+    if config.print_fps or config.print_allocations:
         timer = FPSTimer()
+    if config.print_allocations:
+        monitor = AllocationMonitor(tracker.buffer_pool)
     try:
         if config.show_image:
             cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
             cv2.resizeWindow(WINDOW_NAME, config.width, config.height)
         if tracker.start():
             while True:
-                if config.print_fps:
+                if config.print_fps or config.print_allocations:
                     if timer.update():
-                        print(f"{timer.get_fps():.2f} fps")
+                        if config.print_fps:
+                            print(f"{timer.get_fps():.2f} fps")
+                            reacquire_time = tracker.tracking_state.get_average_reacquire_time()
+                            if reacquire_time is not None:
+                                print(f"average time to reacquire: {reacquire_time * 1000:.1f} ms (losses under {tracker.tracking_state.hold_time:.1f} s)")
+                                tracker.tracking_state.reset_stats()
+                        if config.print_allocations:
+                            allocated_bytes, allocated_blocks, pool_allocations = monitor.get_average()
+                            print(f"per frame: {allocated_bytes:.0f} bytes allocated, {allocated_blocks:+.1f} blocks, {pool_allocations:.2f} buffer reallocations")
+                            monitor.reset()
+                if config.print_allocations:
+                    monitor.begin_frame()
                 left_eye, right_eye = tracker.get_eye_position()
+                if tracker.finished:
+                    break
+                if config.print_allocations:
+                    monitor.end_frame()
                 if left_eye is not None and right_eye is not None:
                     sender.send_eye_position(left_eye, right_eye)
+                    sender.send_gaze(*tracker.get_gaze())
+                    sender.send_head_pose(*tracker.get_head_pose())
+                sender.send_tracking_state(tracker.tracking_state.state, tracker.tracking_state.confidence)
                 if config.show_image:
                     cv2.imshow(WINDOW_NAME, tracker.get_color_image())
                     if cv2.waitKey(1) == 27 or cv2.getWindowProperty(WINDOW_NAME, cv2.WND_PROP_VISIBLE) < 1:
                         break
-                if msvcrt.kbhit():
+                if os.name == "nt" and msvcrt.kbhit():
                     key = msvcrt.getch()
                     if key == b'\x1b':  # ESCキー
                         break
@@ -92,7 +101,98 @@ def main(path,serial=None,port=None,is_flip=False):
         tracker.stop()
         if config.show_image:
             cv2.destroyAllWindows()
-        remove_serial_from_tmp_file(temp_file_path,config.serial)
+        device_lock.release()
+
+def capture_eye_center(tracker, frame_count, show_image):
+    # None when canceled with ESC or when the eyes are not tracked in time
+    centers = []
+    start_time = time.time()
+    while len(centers) < frame_count:
+        if time.time() - start_time > CALIBRATION_POINT_TIMEOUT:
+            print(f"The eyes were not tracked with depth for {CALIBRATION_POINT_TIMEOUT:.0f} s.")
+            return None
+        left_eye, right_eye = tracker.get_eye_position()
+        # a sensor dropout would pull the point towards the camera
+        if tracker.tracking_state.state == TRACKING and np.all(tracker.eyes[:, 2] > 0):
+            centers.append([(l + r) / 2 for l, r in zip(left_eye, right_eye)])
+        if show_image:
+            cv2.imshow(WINDOW_NAME, tracker.get_color_image())
+            if cv2.waitKey(1) == 27:
+                return None
+    return [sum(c) / len(centers) for c in zip(*centers)]
+
+def calibrate(config):
+    if config is None:
+        print("Failed to load config.")
+        return
+    
+    device_lock = DeviceLock(config.serial)
+    if not acquire_device(device_lock):
+        return
+    
+    # calibration needs the sensor depth and raw camera coordinates
+    tracker = create_tracker(config, None, enable_depth_estimation=False, color_only=False, adaptive_profile=False, depth_filter=False)
+    cache = CalibrationCache()
+    calibration = cache.load(config.serial, config.user)
+    if calibration is None:
+        calibration = Calibration()
+    try:
+        if config.show_image:
+            cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
+            cv2.resizeWindow(WINDOW_NAME, config.width, config.height)
+        if not tracker.start():
+            return
+        print("Look at the camera until the iris size is measured.")
+        calibrator = IrisSizeCalibrator(tracker.iris_depth_estimator)
+        while not calibrator.is_complete():
+            tracker.get_eye_position()
+            if tracker.tracking_state.state == TRACKING:
+                calibrator.add(tracker.iris_norm_coords, tracker.sensor_depth)
+            if config.show_image:
+                cv2.imshow(WINDOW_NAME, tracker.get_color_image())
+                if cv2.waitKey(1) == 27:
+                    print("Calibration is canceled.")
+                    return
+        calibration.iris_size, calibration.iris_size_rel_std = calibrator.get_iris_size()
+        print(f"iris size: {calibration.iris_size * 1000:.2f} mm (+/- {calibration.iris_size_rel_std * 100:.1f} %)")
+        
+        if len(config.calibration_points) >= 3:
+            camera_points = []
+            for point in config.calibration_points:
+                input(f"Move the center of your eyes to {point} and press Enter.")
+                center = capture_eye_center(tracker, CALIBRATION_FRAME_COUNT, config.show_image)
+                if center is None:
+                    print("Calibration is canceled.")
+                    return
+                camera_points.append(center)
+            calibration.rotation, calibration.translation, rms = estimate_rigid_transform(camera_points, config.calibration_points)
+            print(f"Estimated the camera-to-world transform. RMS error: {rms * 1000:.1f} mm")
+        else:
+            print("calibration_points needs at least 3 points. the camera-to-world transform is not changed.")
+        
+        if cache.save(config.serial, config.user, calibration):
+            print(f"Saved calibration to {cache.path}")
+    finally:
+        tracker.stop()
+        if config.show_image:
+            cv2.destroyAllWindows()
+        device_lock.release()
+
+def process(config, recording, output, workers=None):
+    # offline tracking of a .bag recording into a JSON lines file, one pose per frame,
+    # with the settings and calibration of the config, as the live tracker used them
+    if config is None:
+        print("Failed to load config.")
+        return
+    calibration = CalibrationCache().load(config.serial, config.user)
+    if calibration is not None:
+        print(f"Loaded calibration for S/N: {config.serial}, user: {config.user}")
+    start_time = time.time()
+    records = process_recording(recording, workers, config=config, calibration=calibration)
+    with open(output, "w") as f:
+        for record in records:
+            f.write(json.dumps(record._asdict()) + "\n")
+    print(f"{len(records)} poses written to {output} in {time.time() - start_time:.1f} s")
 
 def set_args_from_stdin():
     serials = Config.load_serials_from_connected_devices()
@@ -145,15 +245,22 @@ def set_args_from_stdin():
     
 
 if __name__ == "__main__":
-    json_files = glob.glob("*.json")
+    # the --process workers are spawned from the frozen executable, which must hand them over here
+    multiprocessing.freeze_support()
     if len(sys.argv) < 2:
+        # validate every config file up front and report all errors at once
+        configs = load_configs(".")
+        json_files = [path for path, _ in configs]
         if len(json_files) == 1:
-            main(json_files[0])
+            if configs[0][1] is not None:
+                configs[0][1].print()
+            main(configs[0][1])
         elif len(json_files) > 1:
             print("Please specify the path to the config file.")
             print("Available config files")
             for i in range(len(json_files)):
-                print(f"{i}: {json_files[i]}")
+                status = "" if configs[i][1] is not None else " (invalid)"
+                print(f"{i}: {json_files[i]}{status}")
             print(f"{len(json_files)}: do not use config file")
             index = input("Enter the index of the config file: ")
             if not index.isdigit():
@@ -165,9 +272,11 @@ if __name__ == "__main__":
                 if serial is None or port is None or is_flip is None:
                     print("Failed to set args.")
                     sys.exit(1)
-                main(path=None, serial=serial, port=port, is_flip=is_flip)
+                main(create_default_config(serial, port, is_flip))
             elif 0 <= index < len(json_files):
-                main(json_files[index])
+                if configs[index][1] is not None:
+                    configs[index][1].print()
+                main(configs[index][1])
             else:
                 print("Invalid index.")
                 sys.exit(1)
@@ -177,7 +286,23 @@ if __name__ == "__main__":
             if serial is None or port is None or is_flip is None:
                 print("Failed to set args.")
                 sys.exit(1)
-            main(path=None, serial=serial, port=port, is_flip=is_flip)
+            main(create_default_config(serial, port, is_flip))
     else:
-        if sys.argv[1] in json_files:
-            main(sys.argv[1])
+        json_files = glob.glob("*.json")
+        if sys.argv[1] == "--devices":
+            print_device_usage()
+        elif sys.argv[1] == "--calibrate":
+            if len(sys.argv) < 3 or sys.argv[2] not in json_files:
+                print("Please specify the path to the config file to calibrate.")
+                sys.exit(1)
+            calibrate(load_config(sys.argv[2]))
+        elif sys.argv[1] == "--process":
+            if len(sys.argv) < 5 or sys.argv[2] not in json_files or not os.path.isfile(sys.argv[3]):
+                print("Please specify the config, the recording and the output file: --process <config.json> <recording.bag> <output.jsonl> [workers]")
+                sys.exit(1)
+            if len(sys.argv) > 5 and not sys.argv[5].isdigit():
+                print("workers must be a number.")
+                sys.exit(1)
+            process(load_config(sys.argv[2], offline=True), sys.argv[3], sys.argv[4], int(sys.argv[5]) if len(sys.argv) > 5 else None)
+        elif sys.argv[1] in json_files:
+            main(load_config(sys.argv[1]))
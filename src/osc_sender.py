@@ -1,9 +1,12 @@
 from pythonosc import udp_client
+from tracking_state import STATE_CODES
 
 class OSCSender:
-    def __init__(self, ip, port):
+    def __init__(self, ip, port, world_coordinates=False):
         self.ip = ip
         self.port = port
+        # positions already transformed by a calibrated camera-to-world transform
+        self.world_coordinates = world_coordinates
         try:
             self.client = udp_client.SimpleUDPClient(ip, port)
         except Exception as e:
@@ -12,9 +15,33 @@ class OSCSender:
     
     def send_eye_position(self, left_eye, right_eye):
         if self.client is not None:
+            # positions may be numpy views, OSC needs plain floats
+            left_eye = [float(c) for c in left_eye]
+            right_eye = [float(c) for c in right_eye]
             self.client.send_message("/LeftEye", left_eye)
             self.client.send_message("/RightEye", right_eye)
 
-            # temporary center (right-handed coordinate system)
-            center = [(-left_eye[0] - right_eye[0]) / 2, (left_eye[1] + right_eye[1]) / 2, (left_eye[2] + right_eye[2]) / 2]
-            self.client.send_message("/Center", center)
\ No newline at end of file
+            if self.world_coordinates:
+                center = [(left_eye[0] + right_eye[0]) / 2, (left_eye[1] + right_eye[1]) / 2, (left_eye[2] + right_eye[2]) / 2]
+            else:
+                # temporary center (right-handed coordinate system)
+                center = [(-left_eye[0] - right_eye[0]) / 2, (left_eye[1] + right_eye[1]) / 2, (left_eye[2] + right_eye[2]) / 2]
+            self.client.send_message("/Center", center)
+
+    def send_gaze(self, left_gaze, right_gaze):
+        if self.client is not None:
+            if left_gaze is not None:
+                self.client.send_message("/LeftGaze", [float(c) for c in left_gaze])
+            if right_gaze is not None:
+                self.client.send_message("/RightGaze", [float(c) for c in right_gaze])
+
+    def send_head_pose(self, position, rotation):
+        if self.client is not None and position is not None:
+            self.client.send_message("/HeadPosition", [float(c) for c in position])
+            # quaternion as x, y, z, w
+            self.client.send_message("/HeadRotation", [float(c) for c in rotation])
+
+    def send_tracking_state(self, state, confidence):
+        if self.client is not None:
+            self.client.send_message("/TrackingState", STATE_CODES[state])
+            self.client.send_message("/Confidence", float(confidence))
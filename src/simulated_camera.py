@@ -0,0 +1,308 @@
+import time
+import numpy as np
+import cv2
+import pyrealsense2 as rs
+
+
+# serials starting with this prefix are served by SimulatedPipeline instead of a camera
+SIMULATED_SERIAL_PREFIX = "sim-"
+# stream profiles every simulated camera reports, a subset of the D400 color profiles
+SIMULATED_PROFILES = [
+    (424, 240, 30), (424, 240, 60), (424, 240, 90),
+    (640, 480, 30), (640, 480, 60), (640, 480, 90),
+    (848, 480, 30), (848, 480, 60), (848, 480, 90),
+    (1280, 720, 30), (1920, 1080, 30),
+]
+HORIZONTAL_FOV = 69.0 # deg, D435 color
+DEPTH_SCALE = 0.001 # m per z16 unit
+BACKGROUND_DEPTH = 1.5 # m
+CLIP_DEPTH = 0.6 # m, clips carry no depth so the whole frame sits at this distance
+MAX_CLIP_FRAMES = 600
+
+# synthetic face in m
+FACE_SIZE = (0.15, 0.21)
+FACE_BULGE = 0.03
+EYE_SEPARATION = 0.063
+EYE_SIZE = (0.03, 0.012)
+IRIS_DIAMETER = 0.0117
+# face motion: centre amplitude, depth range and periods in s
+MOTION_AMPLITUDE = (0.08, 0.04)
+MOTION_DEPTH_RANGE = (0.45, 0.8)
+MOTION_PERIODS = (7.0, 5.0, 11.0)
+
+SKIN_COLOR = (150, 180, 225) # BGR
+BACKGROUND_COLOR = (70, 70, 70)
+
+
+def is_simulated_serial(serial):
+    return serial.startswith(SIMULATED_SERIAL_PREFIX)
+
+def create_intrinsics(width, height, fov=HORIZONTAL_FOV):
+    # ideal pinhole camera with square pixels
+    intrinsics = rs.intrinsics()
+    intrinsics.width = width
+    intrinsics.height = height
+    intrinsics.fx = intrinsics.fy = width / (2 * np.tan(np.radians(fov) / 2))
+    intrinsics.ppx = (width - 1) / 2
+    intrinsics.ppy = (height - 1) / 2
+    intrinsics.model = rs.distortion.none
+    intrinsics.coeffs = [0.0] * 5
+    return intrinsics
+
+def create_identity_extrinsics():
+    extrinsics = rs.extrinsics()
+    extrinsics.rotation = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0]
+    extrinsics.translation = [0.0, 0.0, 0.0]
+    return extrinsics
+
+
+class SyntheticFaceSource:
+    # cartoon face drifting in front of a flat background, with the matching depth map
+    def __init__(self, width, height, is_rgb):
+        self.width = width
+        self.height = height
+        self.is_rgb = is_rgb
+        self.focal = create_intrinsics(width, height).fx
+
+    def _color(self, bgr):
+        return bgr[::-1] if self.is_rgb else bgr
+
+    def get_face_pose(self, t):
+        # face centre (x right, y down, z) in m at time t
+        x = MOTION_AMPLITUDE[0] * np.sin(2 * np.pi * t / MOTION_PERIODS[0])
+        y = MOTION_AMPLITUDE[1] * np.sin(2 * np.pi * t / MOTION_PERIODS[1])
+        near, far = MOTION_DEPTH_RANGE
+        z = near + (far - near) * (0.5 - 0.5 * np.cos(2 * np.pi * t / MOTION_PERIODS[2]))
+        return x, y, z
+
+    def _project(self, x, y, z, shape):
+        # same horizontal fov at any resolution, principal point at the centre of the image
+        focal = self.focal * shape[1] / self.width
+        return (x / z * focal + (shape[1] - 1) / 2, y / z * focal + (shape[0] - 1) / 2), focal / z
+
+    def render_color(self, t, out):
+        x, y, z = self.get_face_pose(t)
+        (cu, cv), pixels = self._project(x, y, z, out.shape)
+        out[:] = self._color(BACKGROUND_COLOR)
+        center = (int(cu), int(cv))
+        cv2.ellipse(out, center, (int(FACE_SIZE[0] / 2 * pixels), int(FACE_SIZE[1] / 2 * pixels)), 0, 0, 360, self._color(SKIN_COLOR), -1, cv2.LINE_AA)
+        for side in (-1, 1):
+            eye = (int(cu + side * EYE_SEPARATION / 2 * pixels), int(cv - 0.02 * pixels))
+            cv2.ellipse(out, eye, (int(EYE_SIZE[0] / 2 * pixels), int(EYE_SIZE[1] / 2 * pixels)), 0, 0, 360, self._color((245, 245, 245)), -1, cv2.LINE_AA)
+            cv2.circle(out, eye, int(IRIS_DIAMETER / 2 * pixels), self._color((60, 90, 120)), -1, cv2.LINE_AA)
+            cv2.circle(out, eye, int(IRIS_DIAMETER / 5 * pixels), self._color((20, 20, 20)), -1, cv2.LINE_AA)
+            brow = (eye[0], int(eye[1] - 0.018 * pixels))
+            cv2.ellipse(out, brow, (int(0.018 * pixels), int(0.005 * pixels)), 0, 180, 360, self._color((50, 60, 80)), max(1, int(0.004 * pixels)), cv2.LINE_AA)
+        nose = np.array([[cu, cv - 0.005 * pixels], [cu - 0.012 * pixels, cv + 0.035 * pixels], [cu + 0.012 * pixels, cv + 0.035 * pixels]], dtype=np.int32)
+        cv2.fillConvexPoly(out, nose, self._color((120, 150, 200)), cv2.LINE_AA)
+        cv2.ellipse(out, (int(cu), int(cv + 0.065 * pixels)), (int(0.025 * pixels), int(0.008 * pixels)), 0, 0, 360, self._color((90, 90, 170)), -1, cv2.LINE_AA)
+        return out
+
+    def render_depth(self, t, out):
+        x, y, z = self.get_face_pose(t)
+        (cu, cv), pixels = self._project(x, y, z, out.shape)
+        out.fill(int(BACKGROUND_DEPTH / DEPTH_SCALE))
+        # only the face bounding box is touched, the face is an ellipsoid bulging towards the camera
+        half_w = FACE_SIZE[0] / 2 * pixels
+        half_h = FACE_SIZE[1] / 2 * pixels
+        u0, u1 = max(int(cu - half_w), 0), min(int(cu + half_w) + 1, out.shape[1])
+        v0, v1 = max(int(cv - half_h), 0), min(int(cv + half_h) + 1, out.shape[0])
+        if u0 >= u1 or v0 >= v1:
+            return out
+        v, u = np.ogrid[v0:v1, u0:u1]
+        r2 = ((u - cu) / half_w) ** 2 + ((v - cv) / half_h) ** 2
+        face = r2 < 1
+        depth = (z - FACE_BULGE * np.sqrt(np.maximum(1 - r2, 0))) / DEPTH_SCALE
+        region = out[v0:v1, u0:u1]
+        region[face] = depth[face].astype(np.uint16)
+        return out
+
+
+class ClipSource:
+    # replays a short video clip in a loop, at a constant depth
+    def __init__(self, path, width, height, is_rgb):
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise RuntimeError(f"failed to open the clip: {path}")
+        self.clip_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frames = []
+        while len(self.frames) < MAX_CLIP_FRAMES:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            self.frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if is_rgb else frame)
+        capture.release()
+        if len(self.frames) == 0:
+            raise RuntimeError(f"the clip has no frames: {path}")
+
+    def render_color(self, t, out):
+        np.copyto(out, self.frames[int(t * self.clip_fps) % len(self.frames)])
+        return out
+
+    def render_depth(self, t, out):
+        out.fill(int(CLIP_DEPTH / DEPTH_SCALE))
+        return out
+
+
+class SimulatedVideoFrame:
+    def __init__(self, data, timestamp, frame_number):
+        self.data = data
+        self.timestamp = timestamp
+        self.frame_number = frame_number
+
+    def __bool__(self):
+        return True
+
+    def get_data(self):
+        return self.data
+
+    def get_timestamp(self):
+        return self.timestamp
+
+    def get_frame_number(self):
+        return self.frame_number
+
+
+class SimulatedDepthFrame(SimulatedVideoFrame):
+    def get_distance(self, u, v):
+        return float(self.data[v, u]) * DEPTH_SCALE
+
+    def get_units(self):
+        return DEPTH_SCALE
+
+
+class SimulatedFrameset:
+    def __init__(self, color_frame, depth_frame):
+        self.color_frame = color_frame
+        self.depth_frame = depth_frame
+
+    def get_color_frame(self):
+        return self.color_frame
+
+    def get_depth_frame(self):
+        return self.depth_frame
+
+
+class SimulatedStreamProfile:
+    def __init__(self, width, height, fps):
+        self.intrinsics = create_intrinsics(width, height)
+        self._fps = fps
+
+    def as_video_stream_profile(self):
+        return self
+
+    def width(self):
+        return self.intrinsics.width
+
+    def height(self):
+        return self.intrinsics.height
+
+    def fps(self):
+        return self._fps
+
+    def get_intrinsics(self):
+        return self.intrinsics
+
+    def get_extrinsics_to(self, other):
+        # color and depth are rendered from the same viewpoint
+        return create_identity_extrinsics()
+
+
+class SimulatedPipelineProfile:
+    def __init__(self, streams):
+        self.streams = streams
+
+    def get_stream(self, stream):
+        return self.streams[stream]
+
+
+class SimulatedConfig:
+    # stands in for rs.config
+    def __init__(self):
+        self.serial = None
+        self.streams = {}
+
+    def enable_device(self, serial):
+        self.serial = serial
+
+    def enable_stream(self, stream, width, height, format, fps):
+        self.streams[stream] = (width, height, format, fps)
+
+    def disable_all_streams(self):
+        self.streams = {}
+
+
+class SimulatedPipeline:
+    # stands in for rs.pipeline, frames arrive at the configured fps and are dropped
+    # when the consumer falls behind, like a camera with a one-frame queue
+    def __init__(self, clip_path="", realtime=True):
+        self.clip_path = clip_path
+        self.realtime = realtime
+        self.profile = None
+        self.source = None
+        self.start_time = None
+        self.frame_number = -1
+        self.dropped_count = 0
+        # cpu time spent rendering, so load tests can leave the generator out
+        self.render_time = 0.0
+
+    def start(self, config):
+        if rs.stream.color not in config.streams:
+            raise RuntimeError("color stream is not enabled.")
+        width, height, format, fps = config.streams[rs.stream.color]
+        is_rgb = format == rs.format.rgb8
+        self.fps = fps
+        if self.clip_path != "":
+            self.source = ClipSource(self.clip_path, width, height, is_rgb)
+        else:
+            self.source = SyntheticFaceSource(width, height, is_rgb)
+        streams = {rs.stream.color: SimulatedStreamProfile(width, height, fps)}
+        # the frame buffers are reused, consumers copy the data out right away
+        self.color_data = np.empty((height, width, 3), dtype=np.uint8)
+        self.depth_data = None
+        if rs.stream.depth in config.streams:
+            depth_width, depth_height, _, _ = config.streams[rs.stream.depth]
+            streams[rs.stream.depth] = SimulatedStreamProfile(depth_width, depth_height, fps)
+            self.depth_data = np.empty((depth_height, depth_width), dtype=np.uint16)
+        self.profile = SimulatedPipelineProfile(streams)
+        self.start_time = time.perf_counter()
+        self.start_wall_time = time.time()
+        self.frame_number = -1
+        self.dropped_count = 0
+        self.render_time = 0.0
+        return self.profile
+
+    def get_active_profile(self):
+        return self.profile
+
+    def wait_for_frames(self, timeout_ms=5000):
+        if self.realtime:
+            now = time.perf_counter()
+            frame_number = max(self.frame_number + 1, int((now - self.start_time) * self.fps))
+            due = self.start_time + frame_number / self.fps
+            if due > now:
+                time.sleep(due - now)
+            self.dropped_count += frame_number - self.frame_number - 1
+        else:
+            frame_number = self.frame_number + 1
+        self.frame_number = frame_number
+        t = frame_number / self.fps
+        # ms in the system time domain, so latency is time.time() minus the timestamp
+        timestamp = (self.start_wall_time + t) * 1000
+        render_start = time.process_time()
+        self.source.render_color(t, self.color_data)
+        color_frame = SimulatedVideoFrame(self.color_data, timestamp, frame_number)
+        depth_frame = None
+        if self.depth_data is not None:
+            self.source.render_depth(t, self.depth_data)
+            depth_frame = SimulatedDepthFrame(self.depth_data, timestamp, frame_number)
+        self.render_time += time.process_time() - render_start
+        return SimulatedFrameset(color_frame, depth_frame)
+
+    def stop(self):
+        # librealsense refuses to stop a pipeline that is not running
+        if self.profile is None:
+            raise RuntimeError("stop() cannot be called before start()")
+        self.profile = None
+        self.source = None
@@ -0,0 +1,38 @@
+import pyrealsense2 as rs
+from simulated_camera import is_simulated_serial, SIMULATED_PROFILES
+
+
+# depth resolution relative to color when sensor depth is used
+DEPTH_RESOLUTION_SCALE = 0.5
+
+
+def query_video_profiles(serial, stream, format):
+    if is_simulated_serial(serial):
+        return list(SIMULATED_PROFILES)
+    context = rs.context()
+    profiles = []
+    for device in context.query_devices():
+        if device.get_info(rs.camera_info.serial_number) != serial:
+            continue
+        for sensor in device.query_sensors():
+            for profile in sensor.get_stream_profiles():
+                if profile.stream_type() != stream or profile.format() != format:
+                    continue
+                video_profile = profile.as_video_stream_profile()
+                profiles.append((video_profile.width(), video_profile.height(), video_profile.fps()))
+    return sorted(set(profiles))
+
+def select_profile(profiles, width, height, fps):
+    if len(profiles) == 0:
+        return None
+    if (width, height, fps) in profiles:
+        return (width, height, fps)
+    # prefer the requested fps, then the closest pixel count
+    return min(profiles, key=lambda p: (p[2] != fps, abs(p[0] * p[1] - width * height), abs(p[2] - fps)))
+
+def select_depth_profile(profiles, color_width, color_height, fps, scale=DEPTH_RESOLUTION_SCALE):
+    # smallest depth resolution covering the scaled color resolution at the same fps
+    candidates = [p for p in profiles if p[2] == fps and p[0] >= color_width * scale and p[1] >= color_height * scale]
+    if len(candidates) == 0:
+        return select_profile(profiles, color_width, color_height, fps)
+    return min(candidates, key=lambda p: p[0] * p[1])
@@ -0,0 +1,167 @@
+import os
+import heapq
+import multiprocessing
+from typing import NamedTuple, Optional, Tuple
+import pyrealsense2 as rs
+from eye_tracker import EyeTracker, PLAYBACK_TIMEOUT
+from config import TrackerConfig
+
+# chunk length of the offline batch mode
+CHUNK_DURATION = 60.0 # s
+# each chunk starts this much early so the tracking state has settled at its first frame
+WARMUP_DURATION = 1.0 # s
+RECORDING_EXTENSION = ".bag"
+
+Vector3 = Tuple[float, float, float]
+
+
+class PoseRecord(NamedTuple):
+    timestamp: float # ms, librealsense frame timestamp
+    frame_number: int
+    state: str
+    confidence: float
+    # None while the face is lost, gazes also for a closed eye
+    left_eye: Optional[Vector3]
+    right_eye: Optional[Vector3]
+    left_gaze: Optional[Vector3]
+    right_gaze: Optional[Vector3]
+    head_position: Optional[Vector3]
+    head_rotation: Optional[Tuple[float, float, float, float]] # x, y, z, w
+
+
+def _to_tuple(vector):
+    # the tracker reuses its buffers, records keep plain copies
+    return None if vector is None else tuple(float(c) for c in vector)
+
+def create_tracker(source, calibration=None, **options):
+    # source: TrackerConfig, camera serial ("sim-*" for a simulated camera) or path to a .bag recording
+    # options are EyeTracker keyword arguments and override the config
+    if isinstance(source, TrackerConfig):
+        params = {
+            "width": source.width,
+            "height": source.height,
+            "fps": source.fps,
+            "is_flip": source.is_flip,
+            "enable_depth_estimation": source.enable_depth_estimation,
+            "backend": source.backend,
+            "model_dir": source.model_dir,
+            "num_threads": source.num_threads,
+            "enable_display": source.show_image,
+            "hold_time": source.hold_time,
+            "simulation_clip": source.simulation_clip,
+            "adaptive_profile": source.adaptive_profile,
+            "depth_filter": source.depth_filter,
+            "color_only": source.color_only,
+        }
+        params.update(options)
+        return EyeTracker(source.serial, calibration=calibration, **params)
+    if source.endswith(RECORDING_EXTENSION):
+        options.setdefault("enable_display", False)
+        return EyeTracker(os.path.basename(source), calibration=calibration, recording=source, **options)
+    options.setdefault("enable_display", False)
+    return EyeTracker(source, calibration=calibration, **options)
+
+def get_pose(tracker, left_eye, right_eye):
+    left_gaze, right_gaze = tracker.get_gaze() if left_eye is not None else (None, None)
+    head_position, head_rotation = tracker.get_head_pose() if left_eye is not None else (None, None)
+    return PoseRecord(
+        tracker.frame_timestamp,
+        tracker.frame_number,
+        tracker.tracking_state.state,
+        float(tracker.tracking_state.confidence),
+        _to_tuple(left_eye),
+        _to_tuple(right_eye),
+        _to_tuple(left_gaze),
+        _to_tuple(right_gaze),
+        _to_tuple(head_position),
+        _to_tuple(head_rotation),
+    )
+
+def track(source, calibration=None, start=None, end=None, origin=None, **options):
+    # yields a PoseRecord per frame, until a recording ends or the caller stops iterating
+    # start and end limit a recording to the frames with timestamps in [start, end) s from origin,
+    # by default the first frame; the read position of the playback runs ahead of the frames and is not used
+    tracker = create_tracker(source, calibration, **options)
+    if not tracker.start():
+        raise RuntimeError(f"failed to start the tracker for {source}")
+    try:
+        clip = start is not None or end is not None
+        if clip and tracker.playback is None:
+            raise ValueError("start and end are only supported for recordings.")
+        if clip and origin is None:
+            origin = get_recording_start(tracker.recording)
+        # frames queued before the seek are from the start of the file and fall before start
+        if start is not None and start > WARMUP_DURATION:
+            tracker.seek(start - WARMUP_DURATION)
+        while True:
+            left_eye, right_eye = tracker.get_eye_position()
+            if tracker.finished:
+                return
+            if clip:
+                position = (tracker.frame_timestamp - origin) / 1000
+                if end is not None and position >= end:
+                    return
+                if start is not None and position < start:
+                    continue
+            yield get_pose(tracker, left_eye, right_eye)
+    finally:
+        tracker.stop()
+
+
+def get_recording_start(path):
+    # ms, timestamp of the first color frame of a recording
+    pipeline = rs.pipeline()
+    config = rs.config()
+    config.enable_device_from_file(path, repeat_playback=False)
+    profile = pipeline.start(config)
+    try:
+        profile.get_device().as_playback().set_real_time(False)
+        while True:
+            ok, frames = pipeline.try_wait_for_frames(PLAYBACK_TIMEOUT)
+            if not ok:
+                raise RuntimeError(f"{path} has no color frame.")
+            color_frame = frames.get_color_frame()
+            if color_frame:
+                return color_frame.get_timestamp()
+    finally:
+        pipeline.stop()
+
+def get_recording_duration(path):
+    playback = rs.context().load_device(path).as_playback()
+    return playback.get_duration().total_seconds()
+
+def split_recording(duration, chunk_duration=CHUNK_DURATION):
+    # [start, end) s chunks covering the recording, the last one runs to the end of the file
+    chunks = []
+    start = 0.0
+    while start < duration:
+        end = start + chunk_duration if start + chunk_duration < duration else None
+        chunks.append((start, end))
+        start += chunk_duration
+    return chunks
+
+def merge_records(results):
+    # chunk results are each in timestamp order and do not overlap
+    return list(heapq.merge(*results, key=lambda record: record.timestamp))
+
+def _track_chunk(source, start, end, origin, calibration, options):
+    # runs in a worker process, with its own tracker and model instance
+    return list(track(source, calibration, start, end, origin, **options))
+
+def process_recording(path, workers=None, chunk_duration=CHUNK_DURATION, config=None, calibration=None, **options):
+    # splits the recording into chunks, tracks them in parallel and returns the records in timestamp order
+    # with a TrackerConfig the chunks are tracked with its settings, as the live tracker was
+    duration = get_recording_duration(path)
+    # every chunk measures its bounds from the same frame
+    origin = get_recording_start(path)
+    if config is not None:
+        # the recording decides the profile, there is no camera to restart or window to show
+        options = {"recording": path, "enable_display": False, "adaptive_profile": False, **options}
+    source = config if config is not None else path
+    chunks = [(source, start, end, origin, calibration, options) for start, end in split_recording(duration, chunk_duration)]
+    workers = min(workers or os.cpu_count() or 1, max(len(chunks), 1))
+    print(f"{path}: {duration:.1f} s in {len(chunks)} chunks on {workers} workers")
+    # spawn keeps the workers free of the parent's librealsense and model state
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        results = pool.starmap(_track_chunk, chunks)
+    return merge_records(results)
@@ -0,0 +1,54 @@
+TRACKING = "tracking"
+REACQUIRING = "reacquiring"
+LOST = "lost"
+# integer codes sent over OSC
+STATE_CODES = {TRACKING: 0, REACQUIRING: 1, LOST: 2}
+DEFAULT_HOLD_TIME = 0.5 # s
+
+
+class TrackingState:
+    def __init__(self, hold_time=DEFAULT_HOLD_TIME):
+        self.hold_time = hold_time
+        self.state = LOST
+        self.confidence = 0.0
+        self.last_confidence = 0.0
+        self.lost_time = None
+        self.reacquire_count = 0
+        self.total_reacquire_time = 0.0
+
+    def update(self, found, confidence, timestamp):
+        if found:
+            if self.lost_time is not None:
+                # a longer loss is the user leaving and coming back, not a time to reacquire
+                if timestamp - self.lost_time < self.hold_time:
+                    self.reacquire_count += 1
+                    self.total_reacquire_time += timestamp - self.lost_time
+                self.lost_time = None
+            self.state = TRACKING
+            self.confidence = confidence
+            self.last_confidence = confidence
+            return self.state
+
+        if self.state == TRACKING:
+            self.lost_time = timestamp
+        elapsed = timestamp - self.lost_time if self.lost_time is not None else self.hold_time
+        if elapsed < self.hold_time:
+            # hold the last pose while its confidence decays to zero
+            self.state = REACQUIRING
+            self.confidence = self.last_confidence * (1.0 - elapsed / self.hold_time)
+        else:
+            self.state = LOST
+            self.confidence = 0.0
+        return self.state
+
+    def is_holding(self):
+        return self.state == REACQUIRING
+
+    def get_average_reacquire_time(self):
+        if self.reacquire_count == 0:
+            return None
+        return self.total_reacquire_time / self.reacquire_count
+
+    def reset_stats(self):
+        self.reacquire_count = 0
+        self.total_reacquire_time = 0.0
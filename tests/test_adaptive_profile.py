@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from adaptive_profile import AdaptiveProfileController, build_profile_ladder
+
+
+PROFILES = [(640, 480, 30), (424, 240, 30), (640, 480, 15)]
+
+
+def test_scale_steps_come_before_restarts():
+    ladder = build_profile_ladder(PROFILES, 640, 480, 30)
+    assert ladder == [
+        (640, 480, 30, 1.0), (640, 480, 30, 0.75), (640, 480, 30, 0.5),
+        # 424x240 at scale 1.0 would infer more pixels than 640x480 at 0.5
+        (424, 240, 30, 0.75), (424, 240, 30, 0.5),
+        (640, 480, 15, 1.0), (640, 480, 15, 0.75), (640, 480, 15, 0.5),
+    ]
+
+def test_rejected_level_is_dropped():
+    ladder = build_profile_ladder(PROFILES, 640, 480, 30)
+    controller = AdaptiveProfileController(ladder, window=1)
+    for _ in range(3):
+        level = controller.update(1.0)
+        controller.skip_count = 0
+    assert level == (424, 240, 30, 0.75)
+    assert controller.reject() == (640, 480, 30, 0.5)
+    assert (424, 240, 30, 0.75) not in controller.ladder
+    controller.skip_count = 0
+    assert controller.update(1.0) == (424, 240, 30, 0.5)
@@ -0,0 +1,25 @@
+import os
+import sys
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from calibration import estimate_rigid_transform, CAMERA_TO_RIGHT_HANDED
+
+
+def test_fits_right_handed_world_points():
+    rng = np.random.default_rng(0)
+    camera_points = rng.uniform(-0.3, 0.3, (4, 3)) + (0.0, 0.0, 0.6)
+    rotation, _ = cv2.Rodrigues(np.array([0.2, -0.5, 0.3]))
+    world_points = camera_points @ CAMERA_TO_RIGHT_HANDED @ rotation.T + (1.0, 2.0, 3.0)
+    matrix, translation, rms = estimate_rigid_transform(camera_points, world_points)
+    assert rms < 1e-9
+    assert np.allclose(camera_points @ matrix.T + translation, world_points)
+    assert np.isclose(np.linalg.det(matrix), -1.0)
+
+def test_reports_rms_of_inconsistent_points():
+    camera_points = np.array([[0, 0, 0.5], [0.1, 0, 0.5], [0, 0.1, 0.5], [0, 0, 0.7]], dtype=np.float64)
+    world_points = camera_points @ CAMERA_TO_RIGHT_HANDED
+    world_points[3, 2] += 0.04
+    _, _, rms = estimate_rigid_transform(camera_points, world_points)
+    assert rms > 0.01
@@ -0,0 +1,80 @@
+import os
+import sys
+import pytest
+
+pytest.importorskip("pyrealsense2")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from config import compile_config
+
+SERIALS = ["833612071455"]
+HOST_IP = "192.168.0.10"
+
+
+def create_data(**values):
+    data = {"serial": "833612071455", "ip": "", "port": 8000, "width": 640, "height": 480, "fps": 60,
+            "is_flip": True, "enable_depth_estimation": False, "show_image": True, "print_fps": False}
+    data.update(values)
+    return data
+
+def compile(data):
+    return compile_config(data, "test.json", SERIALS, HOST_IP)
+
+def test_valid_config():
+    config, errors, warnings = compile(create_data())
+    assert errors == [] and warnings == []
+    assert config.serial == "833612071455"
+    assert config.ip == HOST_IP
+    assert config.is_flip
+    assert config.backend == "mediapipe"
+
+def test_errors_are_reported_for_every_field():
+    data = create_data(serial="000000000000", ip="999.0.0.1", port=80, width="640")
+    del data["fps"]
+    config, errors, _ = compile(data)
+    assert config is None
+    assert errors == [
+        "serial is not found in the connected devices.",
+        "ip address is invalid.",
+        "0-1023 are well-known ports. They are reserved for system services.",
+        "width must be integer.",
+        "fps is not found in the config file.",
+    ]
+
+def test_deprecated_alias():
+    data = create_data()
+    del data["enable_depth_estimation"]
+    data["enable_estimation_compensation"] = True
+    config, errors, warnings = compile(data)
+    assert errors == []
+    assert warnings == ["enable_estimation_compensation is deprecated. use enable_depth_estimation."]
+    assert config.enable_depth_estimation
+
+def test_lenient_fields_fall_back_to_their_default():
+    config, errors, warnings = compile(create_data(is_flip="yes", show_image=1))
+    assert errors == []
+    assert len(warnings) == 2
+    assert not config.is_flip
+    assert config.show_image
+
+def test_unset_values():
+    config, errors, _ = compile(create_data(serial="", port=-1, width=-1, fps=-1))
+    assert errors == []
+    assert config.serial == SERIALS[0]
+    assert (config.port, config.width, config.fps) == (8000, 640, 30)
+
+def test_simulated_serial_needs_no_camera():
+    config, errors, _ = compile_config(create_data(serial="sim-0"), "test.json", [], HOST_IP)
+    assert errors == []
+    assert config.serial == "sim-0"
+
+def test_runtime_backend_needs_model_dir():
+    _, errors, _ = compile(create_data(backend="onnx"))
+    assert errors == ["model_dir is required for the onnx backend, with face_detection_short_range.onnx, face_landmark.onnx, iris_landmark.onnx."]
+
+def test_config_is_immutable():
+    config, _, _ = compile(create_data())
+    with pytest.raises(AttributeError):
+        config.port = 9000
+    with pytest.raises(AttributeError):
+        del config.port
+    assert config.port == 8000
@@ -0,0 +1,53 @@
+import os
+import sys
+import numpy as np
+import cv2
+import pytest
+
+rs = pytest.importorskip("pyrealsense2")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from deprojection_table import DeprojectionTable
+
+COEFFS = [0.12, -0.25, 0.001, -0.002, 0.08]
+
+
+def create_intrinsics(model=rs.distortion.brown_conrady, coeffs=COEFFS):
+    intrinsics = rs.intrinsics()
+    intrinsics.width, intrinsics.height = 64, 48
+    intrinsics.fx, intrinsics.fy = 60.0, 61.0
+    intrinsics.ppx, intrinsics.ppy = 31.2, 24.7
+    intrinsics.model = model
+    intrinsics.coeffs = coeffs
+    return intrinsics
+
+def test_brown_conrady_matches_opencv():
+    intrinsics = create_intrinsics()
+    table = DeprojectionTable(intrinsics).table
+    v, u = np.mgrid[0:intrinsics.height, 0:intrinsics.width].astype(np.float64)
+    camera_matrix = np.array([[intrinsics.fx, 0, intrinsics.ppx], [0, intrinsics.fy, intrinsics.ppy], [0, 0, 1]])
+    points = np.stack((u, v), axis=-1).reshape(-1, 1, 2)
+    criteria = (cv2.TERM_CRITERIA_COUNT | cv2.TERM_CRITERIA_EPS, 100, 1e-12)
+    expected = cv2.undistortPointsIter(points, camera_matrix, np.array(COEFFS), None, None, criteria).reshape(table.shape)
+    assert np.allclose(table[..., 0], expected[..., 0], atol=1e-6)
+    # the table has y up
+    assert np.allclose(table[..., 1], -expected[..., 1], atol=1e-6)
+
+@pytest.mark.parametrize("model", [rs.distortion.none, rs.distortion.brown_conrady, rs.distortion.inverse_brown_conrady])
+def test_matches_librealsense(model):
+    intrinsics = create_intrinsics(model)
+    table = DeprojectionTable(intrinsics)
+    for u, v in ((0, 0), (10, 40), (31, 24), (63, 47), (50, 5)):
+        x, y, z = rs.rs2_deproject_pixel_to_point(intrinsics, [u, v], 1.0)
+        assert np.allclose(table.table[v, u], (x, -y), atol=1e-5)
+
+def test_flip_is_a_180_degree_rotation():
+    intrinsics = create_intrinsics()
+    table = DeprojectionTable(intrinsics).table
+    flipped = DeprojectionTable(intrinsics, is_flip=True).table
+    assert np.allclose(flipped, -table[::-1, ::-1], atol=1e-7)
+
+def test_lookup_interpolates_between_pixels():
+    table = DeprojectionTable(create_intrinsics(rs.distortion.none))
+    x, y = table.lookup([10.5, 63.0], [20.25, 47.0])
+    assert np.allclose(x, ((10.5 - 31.2) / 60.0, (63 - 31.2) / 60.0), atol=1e-6)
+    assert np.allclose(y, (-(20.25 - 24.7) / 61.0, -(47 - 24.7) / 61.0), atol=1e-6)
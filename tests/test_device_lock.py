@@ -0,0 +1,59 @@
+import os
+import sys
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+from device_lock import DeviceLock, query_device_locks
+
+SERIAL = "833612071455"
+# holds the lock until its stdin is closed
+HOLDER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from device_lock import DeviceLock
+lock = DeviceLock(sys.argv[2], sys.argv[3])
+print("locked" if lock.acquire() else "refused", flush=True)
+sys.stdin.read()
+"""
+
+
+def start_holder(lock_dir):
+    process = subprocess.Popen(
+        [sys.executable, "-c", HOLDER, SRC_DIR, SERIAL, str(lock_dir)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    assert process.stdout.readline().strip() == "locked"
+    return process
+
+def test_lock_is_held_across_processes(tmp_path):
+    holder = start_holder(tmp_path)
+    try:
+        lock = DeviceLock(SERIAL, tmp_path)
+        assert not lock.acquire()
+        assert lock.get_owner() == holder.pid
+        assert query_device_locks([], tmp_path) == {SERIAL: holder.pid}
+    finally:
+        holder.stdin.close()
+        holder.wait(timeout=10)
+    # the OS drops the lock with the process
+    assert query_device_locks([], tmp_path) == {SERIAL: None}
+    lock = DeviceLock(SERIAL, tmp_path)
+    assert lock.acquire()
+    try:
+        assert lock.get_owner() == os.getpid()
+    finally:
+        lock.release()
+
+def test_held_lock_refuses_a_second_process(tmp_path):
+    lock = DeviceLock(SERIAL, tmp_path)
+    assert lock.acquire()
+    try:
+        process = subprocess.run(
+            [sys.executable, "-c", HOLDER, SRC_DIR, SERIAL, str(tmp_path)],
+            input="", capture_output=True, text=True, timeout=10
+        )
+        assert process.stdout.strip() == "refused"
+    finally:
+        lock.release()
+    assert query_device_locks([SERIAL, "841512071532"], tmp_path) == {SERIAL: None, "841512071532": None}
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import pytest
+
+pytest.importorskip("pyrealsense2")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import eye_tracker
+from eye_tracker import EyeTracker
+from adaptive_profile import AdaptiveProfileController
+from simulated_camera import SimulatedPipeline
+
+
+class SlowBackend:
+    # finds no face and takes long enough for the profile controller to step down
+    confidence = 0.0
+
+    def process(self, image):
+        time.sleep(0.05)
+        return None
+
+    def draw(self, image):
+        pass
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FailingPipeline(SimulatedPipeline):
+    # a camera that refuses some color profiles, with the librealsense stop() rule of the simulated pipeline
+    def __init__(self, failing_profiles):
+        super().__init__(realtime=False)
+        self.failing_profiles = failing_profiles
+        self.start_count = 0
+
+    def start(self, config):
+        self.start_count += 1
+        width, height, _, fps = config.streams[eye_tracker.rs.stream.color]
+        if (width, height, fps) in self.failing_profiles:
+            raise RuntimeError("Couldn't resolve requests")
+        return super().start(config)
+
+
+def create_tracker(monkeypatch, failing_profiles):
+    monkeypatch.setattr(eye_tracker, "create_backend", lambda *args, **kwargs: SlowBackend())
+    tracker = EyeTracker("sim-0", 640, 480, 30, enable_display=False)
+    tracker.pipeline = FailingPipeline(failing_profiles)
+    assert tracker.start()
+    tracker.profile_controller = AdaptiveProfileController([(640, 480, 30, 1.0), (424, 240, 30, 1.0), (320, 240, 30, 1.0)], window=1)
+    return tracker
+
+def test_failed_restart_goes_back_to_the_previous_profile(monkeypatch):
+    tracker = create_tracker(monkeypatch, {(424, 240, 30)})
+    tracker.get_eye_position()
+    assert not tracker.finished
+    assert tracker.pipeline_started
+    assert (tracker.width, tracker.height, tracker.fps) == (640, 480, 30)
+    assert (424, 240, 30, 1.0) not in tracker.profile_controller.ladder
+    # the next step down skips the rejected profile
+    tracker.profile_controller.skip_count = 0
+    tracker.get_eye_position()
+    assert (tracker.width, tracker.height) == (320, 240)
+    assert tracker.input_image.shape == (240, 320, 3)
+    tracker.stop()
+
+def test_stops_when_the_previous_profile_fails_too(monkeypatch):
+    tracker = create_tracker(monkeypatch, {(424, 240, 30)})
+    tracker.pipeline.failing_profiles.add((640, 480, 30))
+    tracker.get_eye_position()
+    assert tracker.finished
+    assert not tracker.pipeline_started
+    assert (tracker.width, tracker.height, tracker.fps) == (640, 480, 30)
+    tracker.stop()
@@ -0,0 +1,47 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from iris_depth import IrisDepthEstimator, IRIS_SIZE
+
+FOCAL = 600.0 # px
+
+
+def make_iris(depth, foreshortening=1.0, angle=0.0, noise=0.0, count=1, seed=0):
+    # (count, 5, 2) normalized coords of a synthetic iris: centre, right, top, left, bottom
+    rng = np.random.default_rng(seed)
+    radius = IRIS_SIZE / 2 / depth
+    directions = np.array([[0, 0], [1, 0], [0, 1], [-1, 0], [0, -1]], dtype=np.float64)
+    points = directions * (radius, radius)
+    # the iris turned away shrinks along the turn axis
+    points[:, 0] *= foreshortening
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    points = points @ rotation.T
+    iris = np.broadcast_to(points, (count, 5, 2)).copy()
+    return iris + rng.normal(0.0, noise / FOCAL, iris.shape)
+
+
+def test_exact_depth_without_noise():
+    estimator = IrisDepthEstimator(IRIS_SIZE, FOCAL)
+    depth, sigma = estimator.estimate(make_iris(0.6))
+    assert np.allclose(depth, 0.6)
+    assert np.all(np.isfinite(sigma)) and np.all(sigma > 0)
+
+def test_foreshortened_iris_keeps_the_major_axis():
+    estimator = IrisDepthEstimator(IRIS_SIZE, FOCAL)
+    depth, _ = estimator.estimate(make_iris(0.3, foreshortening=0.7))
+    # the soft threshold costs at most the landmark noise on the diameter
+    assert abs(depth[0] - 0.3) / 0.3 < 0.03
+
+def test_noisy_depth_is_unbiased_and_sigma_is_not_overconfident():
+    estimator = IrisDepthEstimator(IRIS_SIZE, FOCAL, iris_size_rel_std=0.0)
+    depth, sigma = estimator.estimate(make_iris(0.6, noise=0.5, count=2000, seed=1))
+    assert abs(np.mean(depth) - 0.6) < 0.01
+    assert np.std(depth) <= np.mean(sigma) * 1.2
+
+def test_fuse_falls_back_to_iris_on_sensor_dropout():
+    estimator = IrisDepthEstimator(IRIS_SIZE, FOCAL)
+    iris = make_iris(0.6, count=2)
+    depth, _ = estimator.fuse(iris, np.array([0.0, 0.6]))
+    assert np.allclose(depth, 0.6)
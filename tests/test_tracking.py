@@ -0,0 +1,90 @@
+import os
+import sys
+import pickle
+import pytest
+
+pytest.importorskip("pyrealsense2")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import tracking
+from tracking import track, split_recording, merge_records, WARMUP_DURATION
+from tracking_state import TrackingState
+from config import compile_config
+
+FPS = 10
+FRAME_COUNT = 30
+ORIGIN = 5.0e6 # ms, recordings keep the camera's timestamps
+
+
+class PlaybackTracker:
+    # replays FRAME_COUNT frames; like a pipeline, frames read before a seek are still queued after it
+    def __init__(self, queued=2):
+        self.playback = object()
+        self.recording = "session.bag"
+        self.tracking_state = TrackingState()
+        self.finished = False
+        self.queued = queued
+        self.next_index = 0
+        self.pending = []
+        self.frame_timestamp = None
+        self.frame_number = -1
+        self.seeks = []
+
+    def start(self):
+        self.pending = list(range(self.queued))
+        self.next_index = self.queued
+        return True
+
+    def seek(self, seconds):
+        self.seeks.append(seconds)
+        self.next_index = round(seconds * FPS)
+
+    def get_eye_position(self):
+        if len(self.pending) > 0:
+            index = self.pending.pop(0)
+        elif self.next_index < FRAME_COUNT:
+            index = self.next_index
+            self.next_index += 1
+        else:
+            self.finished = True
+            return None, None
+        self.frame_number = index
+        self.frame_timestamp = ORIGIN + index * 1000 / FPS
+        return None, None
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def trackers(monkeypatch):
+    created = []
+    def create_tracker(source, calibration=None, **options):
+        created.append(PlaybackTracker())
+        return created[-1]
+    monkeypatch.setattr(tracking, "create_tracker", create_tracker)
+    return created
+
+def test_split_recording():
+    assert split_recording(2.5, 1.0) == [(0.0, 1.0), (1.0, 2.0), (2.0, None)]
+    assert split_recording(2.0, 1.0) == [(0.0, 1.0), (1.0, None)]
+    assert split_recording(0.5, 1.0) == [(0.0, None)]
+
+def test_track_clips_on_frame_timestamps(trackers):
+    records = list(track("session.bag", start=1.5, end=2.5, origin=ORIGIN))
+    assert [r.frame_number for r in records] == list(range(15, 25))
+    # the queued frames from the start of the file are dropped, not yielded
+    assert trackers[0].seeks == [1.5 - WARMUP_DURATION]
+
+def test_chunks_merge_into_every_frame_once(trackers):
+    results = [list(track("session.bag", start=start, end=end, origin=ORIGIN)) for start, end in split_recording(FRAME_COUNT / FPS, 0.7)]
+    records = merge_records(results[::-1])
+    assert [r.frame_number for r in records] == list(range(FRAME_COUNT))
+    assert [r.timestamp for r in records] == sorted(r.timestamp for r in records)
+
+def test_config_reaches_worker_processes():
+    data = {"serial": "sim-0", "ip": "", "port": 9000, "width": 640, "height": 480, "fps": 60, "is_flip": True,
+            "enable_depth_estimation": False, "show_image": False, "print_fps": False}
+    config, errors, _ = compile_config(data, serials=[], host_ip="127.0.0.1")
+    assert errors == []
+    copy = pickle.loads(pickle.dumps(config))
+    assert copy.is_flip and copy.port == 9000 and copy.serial == "sim-0"
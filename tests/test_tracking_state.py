@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from tracking_state import TrackingState, TRACKING, REACQUIRING, LOST
+
+
+def test_holds_and_decays_after_a_loss():
+    state = TrackingState(hold_time=0.5)
+    state.update(True, 0.8, 0.0)
+    assert state.update(False, 0.0, 0.1) == REACQUIRING
+    assert state.update(False, 0.0, 0.35) == REACQUIRING
+    assert abs(state.confidence - 0.4) < 1e-9
+    assert state.update(False, 0.0, 0.6) == LOST
+    assert state.confidence == 0.0
+
+def test_reacquire_time_counts_short_losses_only():
+    state = TrackingState(hold_time=0.5)
+    state.update(True, 1.0, 0.0)
+    state.update(False, 0.0, 1.0)
+    assert state.update(True, 1.0, 1.2) == TRACKING
+    # the user was away for 10 s
+    state.update(False, 0.0, 2.0)
+    state.update(True, 1.0, 12.0)
+    assert state.reacquire_count == 1
+    assert abs(state.get_average_reacquire_time() - 0.2) < 1e-9